@@ -1,8 +1,12 @@
-from dotenv import load_dotenv
-load_dotenv()
+# The spawned worker processes of the parallel report import this module
+# again (as __mp_main__): they inherit the environment loaded here instead
+# of fetching the secrets again
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
 
-from secret_manager import update_secrets
-update_secrets()
+    from secret_manager import update_secrets
+    update_secrets()
 
 from worker.worker_manual_chain_open_close import ManualOpenCloseChainConsumer
 from worker.worker_aux_files_ingestion import AuxFilesIngestionConsumer
@@ -16,7 +20,7 @@ from typing import Type
 from sqs.sqs_client import SQSClient
 from sqs.base_sqs_consumer import BaseSQSConsumer
 from worker.worker_partner_integration import PartnerIntegrationConsumer
-from service.db_service import get_db_session
+from service.db_service import get_session_factory
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,7 +33,7 @@ class MainApp:
 
     def __init__(self):
         self.sqs_client = SQSClient()
-        self.db_session = get_db_session()
+        self.session_factory = get_session_factory()
         self.consumers: list[BaseSQSConsumer] = []
         self.threads: list[threading.Thread] = []
         self._stopping = False
@@ -37,9 +41,14 @@ class MainApp:
     def register_consumer(self, consumer_cls: Type[BaseSQSConsumer]):
         """
         Registers a consumer based on the class.
-        All use the same SQSClient and db_session (can change this if you want).
+        All use the same SQSClient; each consumer gets its own db_session
+        and the session factory for its workers (sessions are not thread-safe).
         """
-        consumer = consumer_cls(self.sqs_client, self.db_session)
+        consumer = consumer_cls(
+            self.sqs_client,
+            self.session_factory(),
+            session_factory=self.session_factory,
+        )
         self.consumers.append(consumer)
         logger.info("Consumer registered: %s", consumer_cls.__name__)
 
@@ -1,12 +1,73 @@
-from sqlalchemy import Column, Text, BigInteger, Integer, Date, Boolean, Float, CHAR, Time, TIMESTAMP, func, UniqueConstraint, ForeignKey
+from sqlalchemy import Column, Text, BigInteger, Integer, Date, Boolean, Float, CHAR, Time, TIMESTAMP, func, UniqueConstraint, ForeignKey, Index, select
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm import Session, relationship, aliased
 from datetime import date
 from typing import Any, Dict, List
 
 Base = declarative_base()
 
+BULK_CHUNK_SIZE = 1000
+
+# session.info flag set by db_service.deferred_commit: model writes only
+# flush, and the caller commits the whole unit of work
+DEFER_COMMIT = "defer_commit"
+
+
+def commit_or_flush(session: Session):
+    if session.info.get(DEFER_COMMIT):
+        session.flush()
+    else:
+        session.commit()
+
+
+
+def _bulk_upsert(model, session: Session, rows: List[dict], chunk_size: int, constraint: str = None, index_elements: List[str] = None) -> int:
+    """
+    Multi-row INSERT ... ON CONFLICT DO UPDATE, with one commit per chunk.
+
+    Rows repeating a conflict key inside a chunk keep only the last one
+    (Postgres refuses to update the same row twice in one statement), which
+    gives the same result as upserting them one by one.
+    """
+    conflict_columns = index_elements or constraint_columns(model, constraint)
+    rows = list(rows)
+    written = 0
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = {}
+        for row in rows[start:start + chunk_size]:
+            key = tuple(row.get(column) for column in conflict_columns)
+            chunk.pop(key, None)
+            chunk[key] = row
+
+        # A multi-row VALUES needs the same columns in every row
+        groups: Dict[tuple, List[dict]] = {}
+        for row in chunk.values():
+            groups.setdefault(tuple(row.keys()), []).append(row)
+
+        for columns, group in groups.items():
+            stmt = insert(model).values(group)
+            stmt = stmt.on_conflict_do_update(
+                constraint=constraint,
+                index_elements=index_elements,
+                set_={column: stmt.excluded[column] for column in columns},
+            )
+            session.execute(stmt)
+
+        commit_or_flush(session)
+        written += len(chunk)
+
+    return written
+
+
+def constraint_columns(model, constraint: str) -> List[str]:
+    for table_constraint in model.__table__.constraints:
+        if table_constraint.name == constraint:
+            return [column.name for column in table_constraint.columns]
+    raise ValueError(f"Unknown constraint {constraint} for {model.__tablename__}")
+
+
 class ChainScrape(Base):
     __tablename__ = 'chain_scrapes'
     id = Column(BigInteger, primary_key=True)
@@ -32,7 +93,11 @@ class ChainScrape(Base):
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='chain_scrapes_chain_id_scrape_date_key')
 
 
     @classmethod
@@ -76,6 +141,13 @@ class Location(Base):
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    # Existing databases get these through migration_service (version 1)
+    __table_args__ = (
+        Index('ix_locations_partner_hash_id', 'partner_hash_id'),
+        Index('ix_locations_chain_id', 'chain_id'),
+        Index('ix_locations_last_event_date', 'last_event_date'),
+    )
+
     @classmethod
     def upsert(cls, session: Session, data: dict):
         stmt = insert(cls).values(**data)
@@ -84,7 +156,11 @@ class Location(Base):
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, index_elements=['synthetic_location_id'])
         
         
     @classmethod
@@ -146,7 +222,7 @@ class Location(Base):
         else:
             self.closed_at_estimated = date
         
-        session.commit()
+        commit_or_flush(session)
         
     
     def update_last_event_date(self, session: Session, new_last_event_date):
@@ -155,7 +231,7 @@ class Location(Base):
         if not self.last_event_date or self.last_event_date < new_last_event_date:
             self.last_event_date = new_last_event_date
         
-        session.commit()
+        commit_or_flush(session)
 
 
 class LocationEvent(Base):
@@ -181,6 +257,9 @@ class LocationEvent(Base):
 
     __table_args__ = (
         UniqueConstraint('synthetic_location_id', 'scrape_date', 'event_type', name='ux_events_sid_endtype'),
+        # get_last_event: latest event_date_estimated of a location (the
+        # scrape_date filter alone is served by ux_events_sid_endtype)
+        Index('ix_location_events_sid_event_date', 'synthetic_location_id', 'event_date_estimated'),
     )
 
     @classmethod
@@ -191,19 +270,42 @@ class LocationEvent(Base):
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='ux_events_sid_endtype')
     
     
     @classmethod
     def get_all_by_date_range(cls, session, start_date: date, end_date: date) -> List['LocationEvent']:
         query = session.query(cls).filter(cls.scrape_date >= start_date).filter(cls.scrape_date <= end_date)
         return query.all()
+    
+    @classmethod
+    def stream_with_location_by_date_range(cls, session, start_date: date, end_date: date, yield_per: int = BULK_CHUNK_SIZE):
+        """
+        (event, location, last event) of the events scraped in the range, in
+        one query read with a server-side cursor. Events without a location
+        are left out; last event may be None.
+        """
+        last_event = aliased(cls)
+        stmt = (
+            select(cls, Location, last_event)
+            .join(Location, Location.synthetic_location_id == cls.synthetic_location_id)
+            .outerjoin(last_event, last_event.id == cls.last_location_event_id)
+            .where(cls.scrape_date >= start_date)
+            .where(cls.scrape_date <= end_date)
+            .order_by(cls.id)
+            .execution_options(yield_per=yield_per)
+        )
+        return session.execute(stmt)
         
         
     def update_remodel(self, session: Session, remodel_type: str):
         self.last_update = func.now()
         self.remodel_type = remodel_type
-        session.commit()
+        commit_or_flush(session)
         
 
 class UsRegion(Base):
@@ -225,7 +327,11 @@ class UsRegion(Base):
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='zip_key')
         
     @classmethod
     def get_by_zip(cls, session, zip: int) -> 'UsRegion':
@@ -240,26 +346,53 @@ class QualityReport(Base):
     file_name = Column(Text, nullable=False)
     collection_id = Column(Integer, nullable=False)
     row_number = Column(Integer, nullable=False)
-    chain_id = Column(Text, nullable=False)
-    scrape_date = Column(Date, nullable=False)
+    # Blank in the rows reported as INVALID
+    chain_id = Column(Text)
+    scrape_date = Column(Date)
     valitation_result = Column(Text, nullable=False)
     invalid_columns = Column(Text)
     blank_columns = Column(Text)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    # Existing databases get this key through migration_service (version 2)
     __table_args__ = (
-        UniqueConstraint('file_name', 'scrape_date', name='quality_report_file_name_scrape_date_key'),
+        UniqueConstraint('file_name', 'row_number', name='quality_report_file_name_row_number_key'),
     )
 
     @classmethod
     def upsert(cls, session: Session, data: dict):
         stmt = insert(cls).values(**data)
         stmt = stmt.on_conflict_do_update(
-            constraint='quality_report_file_name_scrape_date_key',
+            constraint='quality_report_file_name_row_number_key',
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='quality_report_file_name_row_number_key')
+
+
+class QualityReportSummary(Base):
+    __tablename__ = 'quality_report_summary'
+    id = Column(BigInteger, primary_key=True)
+    file_name = Column(Text, nullable=False)
+    collection_id = Column(Integer, nullable=False)
+    column_name = Column(Text, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    blank_count = Column(Integer, nullable=False)
+    invalid_count = Column(Integer, nullable=False)
+    completeness = Column(Float, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('file_name', 'column_name', name='quality_report_summary_file_name_column_name_key'),
+    )
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='quality_report_summary_file_name_column_name_key')
 
 
 class FileEventLog(Base):
@@ -284,7 +417,11 @@ class FileEventLog(Base):
             set_=data
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='file_event_log_file_name_run_date_key')
 
 
 class ParentChain(Base):
@@ -320,7 +457,11 @@ class ParentChain(Base):
             set_=data,
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, index_elements=['chain_id'])
 
 
 class Landlord(Base):
@@ -367,7 +508,11 @@ class Landlord(Base):
             set_=data,
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, index_elements=['landlord_id'])
 
 
 class Center(Base):
@@ -417,7 +562,11 @@ class Center(Base):
             set_=data,
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, index_elements=['site_id'])
         
 
 class CenterLandlord(Base):
@@ -447,4 +596,35 @@ class CenterLandlord(Base):
             set_=data,
         )
         session.execute(stmt)
-        session.commit()
+        commit_or_flush(session)
+
+    @classmethod
+    def bulk_upsert(cls, session: Session, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        return _bulk_upsert(cls, session, rows, chunk_size, constraint='center_landlords_site_landlord_key')
+
+    @classmethod
+    def replace_for_sites(cls, session: Session, site_ids: List[str], rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+        """
+        Deletes every link of site_ids and inserts rows in their place, with
+        one commit at the end (one flush inside deferred_commit). rows must
+        not repeat a (site_id, landlord_id).
+        """
+        site_ids = list(site_ids)
+        for start in range(0, len(site_ids), chunk_size):
+            session.query(cls).filter(
+                cls.site_id.in_(site_ids[start:start + chunk_size])
+            ).delete(synchronize_session=False)
+
+        for start in range(0, len(rows), chunk_size):
+            session.execute(insert(cls).values(rows[start:start + chunk_size]))
+
+        commit_or_flush(session)
+        return len(rows)
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(Text, nullable=False)
+    applied_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
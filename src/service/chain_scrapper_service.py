@@ -1,10 +1,37 @@
 
 from models import ChainScrape
 from utils.data_util import parse_time_string
+from utils.cell_util import parse_dateflex_series
+from utils.csv_schema import CHAIN_SCRAPE_SCHEMA
 
 
 def upsert_chain_scraper(session, collection_id, row, run_check_count):  
-    chain_scrapper = {  
+    chain_scrapper = get_chain_scraper_data(collection_id, row, run_check_count)
+    ChainScrape.upsert(session, chain_scrapper)
+    return chain_scrapper
+
+
+def bulk_upsert_chain_scrapers(session, collection_id, df_chain_scraper, run_check_counts):
+    """
+    Same result as upsert_chain_scraper on each row, in order: a scrape
+    repeated for a chain and date keeps its last row. Dates are compared
+    parsed, since "1/3/2019" and "2019-01-03" are the same scrape_date for
+    the database.
+    """
+    chain_scrappers = {}
+    scrape_dates = parse_dateflex_series(df_chain_scraper['Date'], CHAIN_SCRAPE_SCHEMA.date_format).tolist()
+    for row, run_check_count, scrape_date in zip(df_chain_scraper.to_dict('records'), run_check_counts.tolist(), scrape_dates):
+        chain_scrapper = get_chain_scraper_data(collection_id, row, run_check_count)
+        key = (chain_scrapper["chain_id"], scrape_date or chain_scrapper["scrape_date"])
+        chain_scrappers.pop(key, None)
+        chain_scrappers[key] = chain_scrapper
+
+    ChainScrape.bulk_upsert(session, list(chain_scrappers.values()))
+    return list(chain_scrappers.values())
+
+
+def get_chain_scraper_data(collection_id, row, run_check_count):
+    return {  
         "chain_id": row['ChainId'],     
         "chain_name": row['ChainName'],  
         "collection_id": collection_id,
@@ -14,9 +41,6 @@ def upsert_chain_scraper(session, collection_id, row, run_check_count):
         "location_count": row['LocationCount'],
         "run_check_count": run_check_count if run_check_count else 0,
     }
-    
-    ChainScrape.upsert(session, chain_scrapper)
-    return chain_scrapper
 
 
 def get_all_chain_scrape(session, collection_id, start_date, end_date):
@@ -1,23 +1,65 @@
 import os
 import logging
+import threading
+from contextlib import contextmanager
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-from models import Base, Location, LocationEvent, ChainScrape
+from models import Base, Location, LocationEvent, ChainScrape, DEFER_COMMIT
+from service.migration_service import run_migrations
 
 logger = logging.getLogger(__name__)
 
+_engine = None
+_schema_checked = False
+_engine_lock = threading.Lock()
+
+
 def get_db_session():
-    engine = get_engine()
-    create_database_schema_if_not_exists(engine)
-    Session = sessionmaker(bind=engine)
+    Session = get_session_factory()
     session = Session()
     return session
 
 
+def get_session_factory():
+    """
+    Session factory bound to the shared engine. Each thread that touches the
+    database must open its own session from it (sessions are not thread-safe).
+    """
+    global _schema_checked
+    engine = get_engine()
+    with _engine_lock:
+        if not _schema_checked:
+            create_database_schema_if_not_exists(engine)
+            _schema_checked = True
+    return sessionmaker(bind=engine)
+
+
 def get_engine():
+    """
+    Returns the engine shared by the whole process (one connection pool).
+    Pool size can be tuned with DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = _create_engine()
+        return _engine
+
+
+def init_worker_process():
+    """
+    Initializer of spawned worker processes, which start with no engine of
+    their own: the schema was already checked by the parent process, so
+    their sessions do not run create_all and the migrations again.
+    """
+    global _schema_checked
+    _schema_checked = True
+
+
+def _create_engine():
     host = os.getenv("DB_HOST")
     port = os.getenv("DB_PORT", "5432")
     name = os.getenv("DB_NAME", "quanterra-mvp")
@@ -28,14 +70,38 @@ def get_engine():
     if not host or not user or not password:
         raise RuntimeError("Missing DB env vars: DB_HOST/DB_USER/DB_PASS must be set (or loaded via update_secrets).")
     
+    pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    
     url = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}?sslmode={sslmode}"
-    return create_engine(url, pool_pre_ping=True)
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
 
 
 def create_database_schema_if_not_exists(engine):
     try:
         Base.metadata.create_all(engine)
+        run_migrations(engine)
         logger.info("Schema do banco de dados criado com sucesso.")
     except Exception as e:
         logger.error(f"Erro fatal ao criar o schema do banco de dados: {e}")
-        raise 
+        raise
+
+
+@contextmanager
+def deferred_commit(session):
+    """
+    Inside the block, the model write methods (upsert, update_status, ...)
+    only flush; committing is up to the caller. Combine with
+    session.begin_nested() to be able to discard a single failed unit.
+    """
+    previous = session.info.get(DEFER_COMMIT, False)
+    session.info[DEFER_COMMIT] = True
+    try:
+        yield session
+    finally:
+        session.info[DEFER_COMMIT] = previous
@@ -1,62 +1,45 @@
 import logging
-from typing import Any, Optional
 
 import pandas as pd
 
 from models import Landlord
+from utils.column_cleaning import ColumnSpec, clean_frame
 
 logger = logging.getLogger(__name__)
 
-
-def _clean_scalar(value: Any) -> Optional[Any]:
-    """
-    Normalizes values from pandas DataFrame to something Postgres accepts.
-
-    - If NaN/NaT -> None
-    - Otherwise, returns the original value.
-    """
-    if pd.isna(value):
-        return None
-    return value
-
-
-def _clean_bool(value: Any) -> bool:
-    """
-    Converts curation fields (ManualChange, ArchiveRecord etc.) to boolean.
-
-    Accepts:
-    - True/False
-    - strings like 'TRUE', 'False', 'sim', 'não', '1'
-    - integers (0/1)
-    - NaN/None -> False
-    """
-    if pd.isna(value):
-        return False
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, str):
-        v = value.strip().lower()
-        return v in ("true", "verdadeiro", "1", "yes", "sim")
-    if isinstance(value, (int, float)):
-        return bool(value)
-    return False
-
-
-def _parse_landlord_id(raw: Any) -> Optional[str]:
-    """
-    Normalizes LandlordID from the spreadsheet:
-
-    - If NaN/None -> None
-    - Otherwise, converts to string and strips.
-    """
-    if pd.isna(raw):
-        return None
-
-    s = str(raw).strip()
-    if not s:
-        return None
-
-    return s
+LANDLORD_COLUMNS = [
+    ColumnSpec("LandlordID", "landlord_id", "text_id"),
+    ColumnSpec("LandlordName", "landlord_name", "text"),
+
+    # General landlord information
+    ColumnSpec("LandlordStatus", "landlord_status"),
+    ColumnSpec("URL", "url"),
+    ColumnSpec("SICCode", "sic_code"),
+    ColumnSpec("NAICSCode", "naics_code"),
+    ColumnSpec("PrimaryCategory", "primary_category"),
+    ColumnSpec("Categories", "categories"),
+    ColumnSpec("Countries", "countries"),
+    ColumnSpec("PropertyCount", "property_count"),
+
+    # Market / public capital
+    ColumnSpec("IsPublic", "is_public", "bool"),
+    ColumnSpec("StockTicker", "stock_ticker"),
+    ColumnSpec("PropertySector", "property_sector"),
+    ColumnSpec("PropertySubsector", "property_subsector"),
+    ColumnSpec("IndexName", "index_name"),
+    ColumnSpec("RegionCoverage", "region_coverage"),
+    ColumnSpec("PropertyURL", "property_url"),
+
+    # Curation / audit trail
+    ColumnSpec("ArchiveRecord", "archive_record", "bool"),
+    ColumnSpec("ManualChange", "manual_change", "bool"),
+    ColumnSpec("ChangeFields", "change_fields"),
+    ColumnSpec("OriginalValues", "original_values"),
+    ColumnSpec("ChangeReason", "change_reason"),
+    ColumnSpec("ModifiedBy", "modified_by"),
+    ColumnSpec("ModifiedDate", "modified_date"),
+    ColumnSpec("UploadTimestamp", "upload_timestamp"),
+]
 
 
 def upsert_landlords_from_excel(session, df_landlords: pd.DataFrame) -> None:
@@ -67,59 +50,16 @@ def upsert_landlords_from_excel(session, df_landlords: pd.DataFrame) -> None:
     Rules:
     - LandlordID is the primary key (text).
     - Converts NaN/NaT to None before sending to database.
-    - Curation/boolean fields are standardized via _clean_bool.
+    - Curation/boolean fields are standardized by the "bool" converter.
     """
     if df_landlords is None or df_landlords.empty:
         logger.warning("upsert_landlords_from_excel: Empty DataFrame; nothing to do.")
         return
 
-    for _, row in df_landlords.iterrows():
-        raw_landlord_id = row.get("LandlordID")
-        landlord_name = row.get("LandlordName")
-
-        landlord_id = _parse_landlord_id(raw_landlord_id)
-
-        # Without ID or name, we skip the row
-        if not landlord_id or pd.isna(landlord_name):
-            continue
-
-        data = {
-            "landlord_id": landlord_id,
-            "landlord_name": str(landlord_name),
-
-            # General landlord information
-            "landlord_status": _clean_scalar(row.get("LandlordStatus")),
-            "url": _clean_scalar(row.get("URL")),
-            "sic_code": _clean_scalar(row.get("SICCode")),
-            "naics_code": _clean_scalar(row.get("NAICSCode")),
-            "primary_category": _clean_scalar(row.get("PrimaryCategory")),
-            "categories": _clean_scalar(row.get("Categories")),
-            "countries": _clean_scalar(row.get("Countries")),
-            "property_count": _clean_scalar(row.get("PropertyCount")),
-
-            # Market / public capital
-            "is_public": _clean_bool(row.get("IsPublic")) if "IsPublic" in row else False,
-            "stock_ticker": _clean_scalar(row.get("StockTicker")),
-            "property_sector": _clean_scalar(row.get("PropertySector")),
-            "property_subsector": _clean_scalar(row.get("PropertySubsector")),
-            "index_name": _clean_scalar(row.get("IndexName")),
-            "region_coverage": _clean_scalar(row.get("RegionCoverage")),
-            "property_url": _clean_scalar(row.get("PropertyURL")),
+    df_clean = clean_frame(df_landlords, LANDLORD_COLUMNS)
 
-            # Curation / audit trail
-            "archive_record": _clean_bool(row.get("ArchiveRecord"))
-            if "ArchiveRecord" in row
-            else False,
-            "manual_change": _clean_bool(row.get("ManualChange"))
-            if "ManualChange" in row
-            else False,
-            "change_fields": _clean_scalar(row.get("ChangeFields")),
-            "original_values": _clean_scalar(row.get("OriginalValues")),
-            "change_reason": _clean_scalar(row.get("ChangeReason")),
-            "modified_by": _clean_scalar(row.get("ModifiedBy")),
-            "modified_date": _clean_scalar(row.get("ModifiedDate")),
-            "upload_timestamp": _clean_scalar(row.get("UploadTimestamp")),
-        }
+    # Without ID or name, we skip the row
+    df_clean = df_clean[df_clean["landlord_id"].notna() & df_clean["landlord_name"].notna()]
 
-        Landlord.upsert(session, data)
-        logger.info("Upsert Landlord landlord_id=%s (%s)", landlord_id, landlord_name)
+    written = Landlord.bulk_upsert(session, df_clean.to_dict("records"))
+    logger.info("Upserted %d Landlords (%d rows skipped)", written, len(df_landlords) - len(df_clean))
@@ -1,20 +1,76 @@
 
+from sqlalchemy import Date, Text, column, select, true, values
+from sqlalchemy.orm import aliased
+
 from models import LocationEvent
 from utils.cell_util import parse_dateflex
 from utils.data_util import clean_dict_for_sqlalchemy
 
+LAST_EVENTS_CHUNK_SIZE = 1000
+
 
 def get_last_event(session, collection_row, location):
     return (
         session.query(LocationEvent)
         .filter_by(synthetic_location_id=location.synthetic_location_id)
-        .filter(LocationEvent.scrape_date < parse_dateflex(collection_row["LastUpdate"]))
+        .filter(LocationEvent.scrape_date < get_row_scrape_date(collection_row))
         .order_by(LocationEvent.event_date_estimated.desc())
         .first()
     )
 
 
-def create_current_event(session, collection_row, location, last_event, suspected_hash_change, midpoint_date):
+def get_last_events(session, pairs, chunk_size=LAST_EVENTS_CHUNK_SIZE):
+    """
+    Batched get_last_event: for each (synthetic_location_id, scrape_date)
+    pair, the event of the location with the latest event_date_estimated
+    among those scraped before scrape_date, or None.
+
+    Runs one VALUES + LATERAL ... LIMIT 1 query per chunk of pairs. Unlike
+    get_last_event, ties on event_date_estimated are broken by the latest
+    scrape_date and then the highest id, so the pick does not depend on the
+    plan of the batched query.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    last_events = dict.fromkeys(pairs)
+
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        wanted = values(
+            column("synthetic_location_id", Text),
+            column("scrape_date", Date),
+            name="wanted",
+        ).data(chunk)
+
+        earlier = aliased(LocationEvent)
+        last_event_id = (
+            select(earlier.id)
+            .where(earlier.synthetic_location_id == wanted.c.synthetic_location_id)
+            .where(earlier.scrape_date < wanted.c.scrape_date)
+            .order_by(*_last_event_order(earlier))
+            .limit(1)
+            .correlate(wanted)
+            .lateral("last_event_id")
+        )
+
+        stmt = (
+            select(wanted.c.synthetic_location_id, wanted.c.scrape_date, LocationEvent)
+            .select_from(wanted)
+            .join(last_event_id, true())
+            .join(LocationEvent, LocationEvent.id == last_event_id.c.id)
+        )
+        for synthetic_location_id, scrape_date, event in session.execute(stmt):
+            last_events[(synthetic_location_id, scrape_date)] = event
+
+    return last_events
+
+
+def _last_event_order(event):
+    # Events of one file share event_date_estimated (the midpoint of the
+    # scrape window): the latest scrape wins the tie
+    return event.event_date_estimated.desc(), event.scrape_date.desc(), event.id.desc()
+
+
+def create_current_event(session, collection_row, location, last_event, suspected_hash_change, midpoint_date, loader=None):
     event  = get_basic_location_event_data(collection_row, location, suspected_hash_change)
     event['event_date_estimated'] = midpoint_date
     event['suspected_hash_change'] = False
@@ -27,7 +83,10 @@ def create_current_event(session, collection_row, location, last_event, suspecte
             last_event.update_remodel(session, remodel_type)
     
     event = clean_dict_for_sqlalchemy(event)
-    LocationEvent.upsert(session, event)
+    if loader is not None:
+        loader.add_event(event)
+    else:
+        LocationEvent.upsert(session, event)
     return LocationEvent(**event)
 
 
@@ -35,13 +94,23 @@ def get_all_by_date_range(db_session, start_date, end_date):
     return LocationEvent.get_all_by_date_range(db_session, start_date, end_date)
 
 
+def stream_with_location_by_date_range(db_session, start_date, end_date):
+    return LocationEvent.stream_with_location_by_date_range(db_session, start_date, end_date)
+
+
+def get_row_scrape_date(collection_row):
+    if "scrape_date" in collection_row:
+        return collection_row["scrape_date"]
+    return parse_dateflex(collection_row['LastUpdate'])
+
+
 def get_basic_location_event_data(collection_row, location, suspected_hash_change):
     return {
         'synthetic_location_id': location.synthetic_location_id,
         'chain_id': location.chain_id,
         'event_type': collection_row['Status'],
         'suspected_hash_change': suspected_hash_change,
-        'scrape_date': parse_dateflex(collection_row['LastUpdate']),
+        'scrape_date': get_row_scrape_date(collection_row),
         'current_opened_at_estimated': location.opened_at_estimated,
         'current_closed_at_estimated': location.closed_at_estimated
     }
@@ -0,0 +1,119 @@
+#
+# In-memory index of the locations of the chains being processed.
+#
+# Collection files are sorted by ChainId, so all locations of a chain are
+# loaded with one query the first time the chain is seen, and the
+# partner_hash_id / synthetic_location_id lookups of its rows are served
+# from dictionaries instead of two queries per row.
+#
+import logging
+from collections import OrderedDict
+
+from models import Location
+
+logger = logging.getLogger(__name__)
+
+LOCATION_INDEX_MAX_LOCATIONS = 200_000
+
+
+class _ChainLocations:
+    def __init__(self, locations):
+        self.by_hash = {}
+        self.by_synthetic_id = {}
+        for location in locations:
+            self.add(location.partner_hash_id, location.synthetic_location_id, location)
+
+    def __len__(self):
+        return len(self.by_synthetic_id)
+
+    def add(self, partner_hash_id, synthetic_location_id, location):
+        if partner_hash_id is not None:
+            self.by_hash.setdefault(partner_hash_id, synthetic_location_id)
+        self.by_synthetic_id[synthetic_location_id] = location
+
+
+class LocationIndex:
+    """
+    Lookups of Location by partner_hash_id and synthetic_location_id, with
+    the locations of each chain loaded lazily on first use.
+
+    The cached objects are the session's own instances, so status changes
+    made through them (update_status, update_last_event_date) are seen by
+    the next rows. Created locations are registered with add(); they are
+    fetched by primary key the next time they are looked up, so a location
+    still staged in a LocationStagingLoader is not found, as with the
+    queries.
+
+    A key missing from the chain is still looked up in the database, since
+    a partner_hash_id or synthetic_location_id may belong to another chain.
+
+    At most max_locations locations are kept; the least recently used
+    chains are dropped first (the chain in use is never dropped).
+    """
+
+    def __init__(self, max_locations: int = LOCATION_INDEX_MAX_LOCATIONS):
+        self.max_locations = max_locations
+        self._chains: "OrderedDict[object, _ChainLocations]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def get_by_partner_hash_id(self, session, chain_id, partner_hash_id):
+        chain = self._get_chain(session, chain_id)
+        synthetic_location_id = chain.by_hash.get(partner_hash_id)
+        if synthetic_location_id is not None:
+            location = self._get_cached(session, chain, synthetic_location_id)
+            if location is not None:
+                return location
+
+        return session.query(Location).filter_by(partner_hash_id=partner_hash_id).first()
+
+    def get_by_synthetic_location_id(self, session, chain_id, synthetic_location_id):
+        chain = self._get_chain(session, chain_id)
+        if synthetic_location_id in chain.by_synthetic_id:
+            return self._get_cached(session, chain, synthetic_location_id)
+
+        return session.get(Location, synthetic_location_id)
+
+    def add(self, chain_id, partner_hash_id, synthetic_location_id):
+        """
+        Registers a location just created (or staged) for the chain.
+        """
+        chain = self._chains.get(chain_id)
+        if chain is None:
+            return
+
+        if synthetic_location_id not in chain.by_synthetic_id:
+            self._size += 1
+        chain.add(partner_hash_id, synthetic_location_id, None)
+
+    def clear(self):
+        self._chains.clear()
+        self._size = 0
+
+    def _get_cached(self, session, chain, synthetic_location_id):
+        location = chain.by_synthetic_id[synthetic_location_id]
+        if location is None:
+            location = session.get(Location, synthetic_location_id)
+            chain.by_synthetic_id[synthetic_location_id] = location
+        return location
+
+    def _get_chain(self, session, chain_id):
+        chain = self._chains.get(chain_id)
+        if chain is not None:
+            self._chains.move_to_end(chain_id)
+            return chain
+
+        chain = _ChainLocations(Location.get_all_by_chain_id(session, chain_id))
+        self._chains[chain_id] = chain
+        self._size += len(chain)
+        logger.info(f"Loaded {len(chain)} locations for ChainId {chain_id}")
+
+        self._evict()
+        return chain
+
+    def _evict(self):
+        while self._size > self.max_locations and len(self._chains) > 1:
+            _, chain = self._chains.popitem(last=False)
+            self._size -= len(chain)
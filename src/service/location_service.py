@@ -1,12 +1,20 @@
 import pandas as pd
+import numpy as np
 import hashlib
+from pandas.api.types import is_numeric_dtype
 from utils.cell_util import slugify_string
 from models import Location
 from utils.cell_util import slugify_string, normalize_address,title_case_city, parse_dateflex
-from utils.data_util import get_zip_treated, truncate, clean_dict_for_sqlalchemy
+from utils.cell_util import str_values, slugify_series, normalize_address_series, title_case_city_series, upper_strip_series, parse_dateflex_series
+from utils.csv_schema import COLLECTION_SCHEMA
+from utils.data_util import get_zip_treated, get_zip_treated_series, truncate, clean_dict_for_sqlalchemy
 
 from datetime import datetime, timedelta
 
+NORMALIZED_SOURCE_COLUMNS = {"ChainName", "Address", "City", "State", "PostalCode", "Status"}
+STATUS_BY_NAME = {"added": "OPEN", "removed": "CLOSE"}
+SYNTHETIC_ID_SOURCE_COLUMNS = {"Latitude", "Longitude", "StoreNumber"}
+
 
 def update_location_status(session, update_location_status_csv):
     for idx, row in update_location_status_csv.iterrows():
@@ -24,23 +32,71 @@ def close_location_by_limit(session, weeks):
     Location.close_when_limit_expires(session, limit_date)
         
 
-def get_or_create_location(session, collection_row, midpoint):
+def normalize_collection(df_collection_csv):
+    """
+    Adds the chain_slug, address_normalized, city, state, zip and status
+    columns that get_location_treated would compute for each row, computed
+    column-wise, plus a normalized flag, and the parsed LastUpdate as
+    scrape_date. Rows whose values the scalar
+    functions would reject (e.g. a number or NaN where a string is
+    expected) are left with normalized False and are treated row by row,
+    so they fail the same way.
+    """
+    if not NORMALIZED_SOURCE_COLUMNS.issubset(df_collection_csv.columns):
+        return df_collection_csv
+    
+    columns = {
+        'chain_slug': slugify_series(df_collection_csv["ChainName"]),
+        'address_normalized': normalize_address_series(df_collection_csv["Address"]),
+        'city': title_case_city_series(df_collection_csv["City"]),
+        'state': upper_strip_series(df_collection_csv["State"]),
+        'zip': get_zip_treated_series(df_collection_csv["PostalCode"]),
+        'status': get_status_series(df_collection_csv["Status"]),
+    }
+    
+    postal_code = df_collection_csv["PostalCode"]
+    normalized = postal_code.isna() | str_values(postal_code).notna()
+    for column in ('chain_slug', 'address_normalized', 'city', 'state', 'status'):
+        normalized &= columns[column].notna()
+    columns['normalized'] = normalized
+    
+    if "LastUpdate" in df_collection_csv.columns:
+        columns['scrape_date'] = parse_dateflex_series(df_collection_csv["LastUpdate"], COLLECTION_SCHEMA.date_format)
+    
+    return df_collection_csv.assign(**columns)
+
+
+def get_or_create_location(session, collection_row, midpoint, loader=None, index=None):
     suspected_hash_change = False
+    chain_id = collection_row['ChainId']
     
     hashId = collection_row['HashId']
-    location = get_location_by_partner_hash_id(session, hashId)
+    if index is not None:
+        location = index.get_by_partner_hash_id(session, chain_id, hashId)
+    else:
+        location = get_location_by_partner_hash_id(session, hashId)
     if location is not None:
-        location.update_status(session, get_status(collection_row['Status']), midpoint)
+        location.update_status(session, get_row_status(collection_row), midpoint)
         return location, suspected_hash_change
     
+    if not collection_row.get("has_coordinates", True):
+        # Without coordinates there is no synthetic_location_id to match or create
+        return None, suspected_hash_change
+    
     synthetic_id = get_synthetic_location_id(collection_row)
-    location = get_location_by_synthetic_location_id(session, synthetic_id)
+    if index is not None:
+        location = index.get_by_synthetic_location_id(session, chain_id, synthetic_id)
+    else:
+        location = get_location_by_synthetic_location_id(session, synthetic_id)
     if location is not None:
-        location.update_status(session, get_status(collection_row['Status']), midpoint)
+        location.update_status(session, get_row_status(collection_row), midpoint)
         suspected_hash_change = True
         return location, suspected_hash_change
 
-    return create_location(session, collection_row, synthetic_id, midpoint), suspected_hash_change
+    location = create_location(session, collection_row, synthetic_id, midpoint, loader)
+    if index is not None:
+        index.add(chain_id, location.partner_hash_id, synthetic_id)
+    return location, suspected_hash_change
 
 
 def get_location_by_partner_hash_id(session, partner_hash_id):
@@ -48,7 +104,61 @@ def get_location_by_partner_hash_id(session, partner_hash_id):
     return location
 
 
+def add_synthetic_location_ids(df_collection_csv):
+    """
+    Caches get_synthetic_location_ids in a synthetic_location_id column,
+    used by get_synthetic_location_id (kept when already there).
+    """
+    if not SYNTHETIC_ID_SOURCE_COLUMNS.issubset(df_collection_csv.columns):
+        return df_collection_csv
+    if "synthetic_location_id" in df_collection_csv.columns:
+        return df_collection_csv
+    return df_collection_csv.assign(synthetic_location_id=get_synthetic_location_ids(df_collection_csv))
+
+
+def get_synthetic_location_ids(df_collection_csv):
+    """
+    get_synthetic_location_id of every row, with None where it would raise
+    or where Latitude / Longitude are not numeric columns (those rows are
+    computed row by row).
+    """
+    latitude = df_collection_csv['Latitude']
+    longitude = df_collection_csv['Longitude']
+    if not (is_numeric_dtype(latitude) and is_numeric_dtype(longitude)):
+        return pd.Series([None] * len(df_collection_csv), index=df_collection_csv.index, dtype=object)
+
+    lat = latitude.to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = longitude.to_numpy(dtype=np.float64, na_value=np.nan)
+    is_valid = np.isfinite(lat) & np.isfinite(lon)
+
+    # Same as truncate(); + 0.0 turns -0.0 into 0.0, as int() does
+    factor = 10 ** 4
+    lat = (np.trunc(lat * factor) / factor + 0.0).tolist()
+    lon = (np.trunc(lon * factor) / factor + 0.0).tolist()
+
+    store_number = df_collection_csv['StoreNumber']
+    store_number_is_na = store_number.isna().to_numpy()
+    store_number = store_number.to_numpy(dtype=object)
+
+    synthetic_ids = []
+    for i in range(len(lat)):
+        if not is_valid[i]:
+            synthetic_ids.append(None)
+            continue
+
+        hash_input = f"{lat[i]}:{lon[i]}"
+        if store_number_is_na[i]:
+            hash_input = hash_input + f":{store_number[i]}"
+        synthetic_ids.append(hashlib.sha256(hash_input.encode('utf-8')).hexdigest())
+
+    return pd.Series(synthetic_ids, index=df_collection_csv.index, dtype=object)
+
+
 def get_synthetic_location_id(collection_row):
+    synthetic_id = collection_row.get('synthetic_location_id')
+    if isinstance(synthetic_id, str):
+        return synthetic_id
+    
     lat = collection_row['Latitude']
     lon = collection_row['Longitude']
     
@@ -74,11 +184,18 @@ def get_location_by_synthetic_location_id(session, synthetic_location_id):
 
 def get_location_treated(collection_row, synthetic_location_id, midpoint):
     chain_name = collection_row["ChainName"]
-    chain_slug = slugify_string(chain_name)
-    address = normalize_address(collection_row["Address"])
-    city = title_case_city(collection_row["City"])
-    state = collection_row["State"].upper().strip()
-    zip_code = get_zip_treated(collection_row["PostalCode"])
+    if collection_row.get("normalized", False):
+        chain_slug = collection_row["chain_slug"]
+        address = collection_row["address_normalized"]
+        city = collection_row["city"]
+        state = collection_row["state"]
+        zip_code = collection_row["zip"]
+    else:
+        chain_slug = slugify_string(chain_name)
+        address = normalize_address(collection_row["Address"])
+        city = title_case_city(collection_row["City"])
+        state = collection_row["State"].upper().strip()
+        zip_code = get_zip_treated(collection_row["PostalCode"])
     
     return {
         'synthetic_location_id': synthetic_location_id,
@@ -95,7 +212,7 @@ def get_location_treated(collection_row, synthetic_location_id, midpoint):
         'parent_chain_name': collection_row['ParentChainName'],
         'coming_soon': collection_row.get('ComingSoon', False),
         'store_hours': collection_row.get('StoreHours', ""),
-        'status': get_status(collection_row['Status']), 
+        'status': get_row_status(collection_row), 
         'latitude': collection_row['Latitude'],
         'longitude': collection_row['Longitude'],
         'site_id': collection_row.get('SiteId', ""),
@@ -106,13 +223,29 @@ def get_location_treated(collection_row, synthetic_location_id, midpoint):
     }
     
 
-def create_location(session, collection_row, synthetic_location_id, midpoint):
+def create_location(session, collection_row, synthetic_location_id, midpoint, loader=None):
     location_data = get_location_treated(collection_row, synthetic_location_id, midpoint)
     location_data = clean_dict_for_sqlalchemy(location_data)
-    Location.upsert(session, location_data)
+    if loader is not None:
+        loader.add_location(location_data)
+    else:
+        Location.upsert(session, location_data)
     return Location(**location_data)
 
 
+def get_row_status(collection_row):
+    if collection_row.get("normalized", False):
+        return collection_row["status"]
+    return get_status(collection_row['Status'])
+
+
+def get_status_series(values):
+    """
+    get_status of each value, NaN where it would raise.
+    """
+    return str_values(values).str.strip().str.lower().map(STATUS_BY_NAME)
+
+
 def get_status(status_str):
     status_str = (status_str or "").strip().lower()
     if status_str == "added":
@@ -0,0 +1,171 @@
+#
+# Bulk load of locations / location_events through a staging table.
+#
+# Rows are streamed with COPY FROM STDIN into a temporary table and merged
+# into the real table with a single INSERT ... SELECT ... ON CONFLICT,
+# instead of one upsert + commit per row.
+#
+import csv
+import io
+import logging
+import math
+from typing import Any, Dict, List
+
+from models import Location, LocationEvent, commit_or_flush, constraint_columns
+from service.db_service import deferred_commit
+
+logger = logging.getLogger(__name__)
+
+# COPY marker for NULL (an empty quoted string stays an empty string)
+COPY_NULL = r"\N"
+
+
+class LocationStagingLoader:
+    """
+    Collects prepared Location / LocationEvent rows and writes them with
+    COPY + merge on flush().
+
+    The merge keeps the upsert semantics of the models: on conflict
+    (synthetic_location_id for locations, ux_events_sid_endtype for events)
+    only the columns present in the rows are updated, and a key repeated
+    in the batch keeps its last row.
+    """
+
+    def __init__(self):
+        self._locations: List[Dict[str, Any]] = []
+        self._events: List[Dict[str, Any]] = []
+
+    def __len__(self):
+        return len(self._locations) + len(self._events)
+
+    def add_location(self, data: Dict[str, Any]):
+        self._locations.append(data)
+
+    def add_event(self, data: Dict[str, Any]):
+        self._events.append(data)
+
+    def mark(self):
+        """
+        Position of the staged rows, for discard_since().
+        """
+        return len(self._locations), len(self._events)
+
+    def discard_since(self, mark):
+        """
+        Drops the rows staged after mark() (e.g. by a row rolled back to its
+        savepoint), so flush() does not write them.
+        """
+        locations_count, events_count = mark
+        del self._locations[locations_count:]
+        del self._events[events_count:]
+
+    def flush(self, session):
+        """
+        Writes the staged rows and commits (only flushes inside
+        deferred_commit). If the bulk merge fails, the rows are written one
+        by one so a single bad row is skipped.
+        """
+        locations, self._locations = self._locations, []
+        events, self._events = self._events, []
+        if not locations and not events:
+            return
+
+        with deferred_commit(session):
+            try:
+                with session.begin_nested():
+                    copy_merge(session, Location, locations, index_elements=["synthetic_location_id"])
+                    copy_merge(session, LocationEvent, events, constraint="ux_events_sid_endtype")
+                logger.info(f"Staged load of {len(locations)} locations and {len(events)} events")
+            except Exception as e:
+                logger.warning(f"Staged load failed, writing rows one by one - Error: {e}")
+                failed = _upsert_one_by_one(session, Location, locations)
+                # As in the row-by-row report, a row whose location fails gets no event
+                failed_ids = {row.get("synthetic_location_id") for row in failed}
+                events = [event for event in events if event.get("synthetic_location_id") not in failed_ids]
+                _upsert_one_by_one(session, LocationEvent, events)
+
+        commit_or_flush(session)
+
+
+def copy_merge(session, model, rows: List[Dict[str, Any]], constraint: str = None, index_elements: List[str] = None):
+    """
+    COPY the rows into a temporary table shaped like the model table and
+    merge them with INSERT ... SELECT DISTINCT ON ... ON CONFLICT DO UPDATE.
+    Does not commit.
+    """
+    table = model.__tablename__
+    if constraint:
+        conflict_columns = constraint_columns(model, constraint)
+        on_conflict = f"ON CONFLICT ON CONSTRAINT {constraint}"
+    else:
+        conflict_columns = index_elements
+        on_conflict = f"ON CONFLICT ({', '.join(index_elements)})"
+
+    # Rows with different keys are merged separately, so a missing key never
+    # overwrites an existing value with NULL
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row.keys()), []).append(row)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        for columns, group in groups.items():
+            column_list = ", ".join(columns)
+            staging = f"staging_{table}"
+
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {table} WITH NO DATA"
+            )
+            cursor.execute(f"ALTER TABLE {staging} ADD COLUMN staging_seq BIGINT")
+
+            cursor.copy_expert(
+                f"COPY {staging} ({column_list}, staging_seq) FROM STDIN "
+                f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                _to_csv_buffer(group, columns),
+            )
+
+            key_list = ", ".join(conflict_columns)
+            update_list = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging} "
+                f"ORDER BY {key_list}, staging_seq DESC "
+                f"{on_conflict} DO UPDATE SET {update_list}"
+            )
+            cursor.execute(f"DROP TABLE {staging}")
+    finally:
+        cursor.close()
+
+
+def _to_csv_buffer(rows: List[Dict[str, Any]], columns: tuple) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for seq, row in enumerate(rows):
+        writer.writerow([_to_copy_value(row.get(column)) for column in columns] + [seq])
+    buffer.seek(0)
+    return buffer
+
+
+def _to_copy_value(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return COPY_NULL
+    return value
+
+
+def _upsert_one_by_one(session, model, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Returns the rows that failed.
+    """
+    failed = []
+    for row in rows:
+        try:
+            with session.begin_nested():
+                model.upsert(session, row)
+        except Exception as e:
+            failed.append(row)
+            logger.warning(f"Error upserting {model.__tablename__} row {row} - Error: {e}")
+    if failed:
+        logger.info(f"Rows with error: {len(failed)} from {len(rows)} in {model.__tablename__}")
+    return failed
+
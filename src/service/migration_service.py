@@ -0,0 +1,109 @@
+#
+# Versioned schema migrations for databases created before a model change.
+#
+# Base.metadata.create_all only creates missing tables, so indexes added to
+# the models never reach existing tables. Each migration here runs once,
+# in order, and is recorded in schema_migrations. Indexes are built with
+# CREATE INDEX CONCURRENTLY, so the tables stay writable while they build.
+#
+import logging
+from collections import namedtuple
+
+from sqlalchemy import text
+
+from models import SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key: only one process migrates at a time
+MIGRATION_LOCK_KEY = 7311001
+
+Migration = namedtuple("Migration", ["version", "description", "upgrade"])
+
+
+def create_index_concurrently(conn, name: str, table: str, columns: list, unique: bool = False):
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS. A previous build that failed
+    leaves an INVALID index with the same name, which is dropped first.
+    """
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        logger.warning(f"Dropping invalid index {name}")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    conn.execute(
+        text(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    )
+
+
+def _hot_lookup_indexes(conn):
+    create_index_concurrently(conn, "ix_locations_partner_hash_id", "locations", ["partner_hash_id"])
+    create_index_concurrently(conn, "ix_locations_chain_id", "locations", ["chain_id"])
+    create_index_concurrently(conn, "ix_locations_last_event_date", "locations", ["last_event_date"])
+    create_index_concurrently(
+        conn, "ix_location_events_sid_event_date", "location_events", ["synthetic_location_id", "event_date_estimated"]
+    )
+
+
+def _quality_report_row_key(conn):
+    # (file_name, scrape_date) kept one row per date of each file; every
+    # row of the file is kept now, and rows with a blank ChainId or
+    # LastUpdate can be saved
+    conn.execute(text("ALTER TABLE quality_report ALTER COLUMN chain_id DROP NOT NULL"))
+    conn.execute(text("ALTER TABLE quality_report ALTER COLUMN scrape_date DROP NOT NULL"))
+
+    exists = conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = 'quality_report_file_name_row_number_key'")
+    ).first()
+    if not exists:
+        conn.execute(text(
+            "DELETE FROM quality_report q USING quality_report newer "
+            "WHERE newer.file_name = q.file_name AND newer.row_number = q.row_number AND newer.id > q.id"
+        ))
+        create_index_concurrently(
+            conn, "quality_report_file_name_row_number_key", "quality_report", ["file_name", "row_number"], unique=True
+        )
+        conn.execute(text(
+            "ALTER TABLE quality_report ADD CONSTRAINT quality_report_file_name_row_number_key "
+            "UNIQUE USING INDEX quality_report_file_name_row_number_key"
+        ))
+
+    conn.execute(text("ALTER TABLE quality_report DROP CONSTRAINT IF EXISTS quality_report_file_name_scrape_date_key"))
+
+
+MIGRATIONS = [
+    Migration(1, "Indexes for locations / location_events hot lookups", _hot_lookup_indexes),
+    Migration(2, "quality_report unique per (file_name, row_number)", _quality_report_row_key),
+]
+
+
+def run_migrations(engine):
+    """
+    Applies the pending migrations. Runs in autocommit (CONCURRENTLY cannot
+    run inside a transaction) holding an advisory lock, so workers starting
+    together wait for the first one instead of building the same index.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            applied = {row[0] for row in conn.execute(text(f"SELECT version FROM {SchemaMigration.__tablename__}"))}
+
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+
+                logger.info(f"Applying migration {migration.version}: {migration.description}")
+                migration.upgrade(conn)
+                conn.execute(
+                    text(f"INSERT INTO {SchemaMigration.__tablename__} (version, description) VALUES (:version, :description)"),
+                    {"version": migration.version, "description": migration.description},
+                )
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -1,87 +1,339 @@
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
 
-from models import QualityReport
+from models import QualityReport, QualityReportSummary
+from utils.cell_util import str_values, parse_dateflex
+from utils.data_util import clean_dict_for_sqlalchemy
 
 REQUIRED_FIELDS = ["ChainId", "LastUpdate", "Latitude", "Longitude", "Status"]
+NUMERIC_FIELDS = ["Latitude", "Longitude"]
+# Rows read at a time by the blank pass over the columns out of the schema
+BLANK_PASS_CHUNK_SIZE = 50000
+
+
+class QualityReportCollector:
+    """
+    Quality report of a file, validated whole (validate) or chunk by chunk
+    while it is streamed (collect). The per-column completeness summary is
+    always kept (as running counts), the per-row report only with detail.
+
+    The validated frames are returned with the has_status and
+    has_coordinates flags (see add_enrichment_flags), so the report
+    generation that follows skips the rows that cannot be enriched.
+
+    With file, the columns of the file that the validated frames do not
+    have (those left out by the read schema) are checked for blanks too,
+    by a separate pass that reads only them (see FileBlankMasks). The
+    frames must then be the rows of the file, in order.
+    """
+
+    def __init__(self, detail: bool = True, file=None):
+        self.detail = detail
+        self.rows = []
+        self._counts = None
+        self._saved_row_count = 0
+        self._file = file
+        self._header = None
+        self._other_blanks = None
+
+    def validate(self, df_collection_csv):
+        blank = get_blank_mask(df_collection_csv)
+        invalid = get_invalid_mask(df_collection_csv, blank)
+        df_validated = add_enrichment_flags(df_collection_csv, blank, invalid)
+        if self._file is not None:
+            blank, invalid = self._with_other_columns(df_collection_csv, blank, invalid)
+        if self.detail:
+            self.rows.extend(get_quality_rows(df_collection_csv, blank, invalid))
+        counts = get_quality_counts(blank, invalid)
+        if self._counts is not None:
+            counts = pd.concat([self._counts, counts]).groupby("Column", sort=False).sum().reset_index()
+        self._counts = counts
+        return df_validated
+
+    def _with_other_columns(self, df_collection_csv, blank, invalid):
+        """
+        blank and invalid with the columns of the file out of
+        df_collection_csv (never invalid), in the order of the file.
+        """
+        if self._header is None:
+            self._header = pd.read_csv(self._file, nrows=0).columns.tolist()
+            other_columns = [column for column in self._header if column not in df_collection_csv.columns]
+            if other_columns:
+                self._other_blanks = FileBlankMasks(self._file, other_columns)
+        if self._other_blanks is None:
+            return blank, invalid
+
+        blank = pd.concat([blank, self._other_blanks.take(blank.index)], axis=1)[self._header]
+        invalid = invalid.reindex(columns=self._header, fill_value=False)
+        return blank, invalid
+
+    def collect(self, df_collection_chunks, session=None, collection_id=None, output_name=None):
+        """
+        Validates and yields each chunk. With session, the per-row report
+        of each chunk is saved (see save_rows) before the chunk is yielded,
+        so the rows of only one chunk are held.
+        """
+        for df_chunk in df_collection_chunks:
+            df_chunk = self.validate(df_chunk)
+            if session is not None:
+                self.save_rows(session, collection_id, output_name)
+            yield df_chunk
+
+    def summary(self):
+        if self._counts is None:
+            return get_quality_summary(pd.DataFrame(), pd.DataFrame())
+        return with_completeness(self._counts)
+
+    def save_rows(self, session, collection_id, output_name):
+        """
+        Upserts the per-row report collected since the last call, appends
+        it to output_name (written with its header on the first call) and
+        clears it.
+        """
+        if not self.detail or not self.rows:
+            return
+        save_rows_in_database(session, self.rows, collection_id, output_name)
+        first = self._saved_row_count == 0
+        pd.DataFrame(self.rows).to_csv(output_name, mode="w" if first else "a", header=first, index=False)
+        self._saved_row_count += len(self.rows)
+        self.rows = []
+
+    def save(self, session, collection_id, output_name):
+        """
+        Saves the summary, and with detail the per-row report not saved
+        yet, in one multi-row upsert each. output_name gets the per-row
+        report, or the summary without detail.
+        """
+        summary = self.summary()
+        save_summary_in_database(session, summary, collection_id, output_name)
+        if not self.detail:
+            return summary.to_csv(output_name, index=False)
+
+        if self._saved_row_count == 0 and not self.rows:
+            return pd.DataFrame(self.rows).to_csv(output_name, index=False)
+        self.save_rows(session, collection_id, output_name)
 
-def generate_quality_report_and_save(df_collection_csv, collection_id, output_name):
-    rows = generate_quality_report(df_collection_csv)
-    result_df = pd.DataFrame(rows)
-    save_rows_in_database(rows, collection_id, output_name)
-    
-    return result_df.to_csv(output_name, index=False)
+
+class FileBlankMasks:
+    """
+    Blank masks of some columns of a file, read as text BLANK_PASS_CHUNK_SIZE
+    rows at a time, so only the masks of one read chunk are held. take()
+    hands them out in the order of the file.
+    """
+
+    def __init__(self, file, columns, chunk_size: int = BLANK_PASS_CHUNK_SIZE):
+        self.columns = columns
+        self._chunks = pd.read_csv(file, usecols=columns, dtype=str, chunksize=chunk_size)
+        self._pending = pd.DataFrame(False, index=range(0), columns=columns)
+
+    def take(self, index):
+        """
+        Masks of the next len(index) rows of the file, with index.
+        """
+        parts = []
+        needed = len(index)
+        while needed > 0:
+            if len(self._pending) == 0:
+                self._pending = get_blank_mask(next(self._chunks))[self.columns]
+            parts.append(self._pending.iloc[:needed])
+            self._pending = self._pending.iloc[needed:]
+            needed -= len(parts[-1])
+
+        masks = pd.concat(parts) if parts else self._pending.iloc[:0]
+        masks.index = index
+        return masks
+
+
+def generate_quality_report_and_save(session, df_collection_csv, collection_id, output_name, detail=True):
+    quality_report = QualityReportCollector(detail)
+    quality_report.validate(df_collection_csv)
+    return quality_report.save(session, collection_id, output_name)
 
 
 def generate_quality_report(df_collection_csv):
-    rows = []
+    """
+    The blank and invalid cells of every column are found column-wise, and
+    the BlankColumns / InvalidColumns strings are only built for the rows
+    that have any.
+    """
+    blank = get_blank_mask(df_collection_csv)
+    invalid = get_invalid_mask(df_collection_csv, blank)
+    return get_quality_rows(df_collection_csv, blank, invalid)
+
+
+def get_quality_rows(df_collection_csv, blank, invalid):
+    required = [col for col in df_collection_csv.columns if col in REQUIRED_FIELDS]
+    has_required_problem = (blank[required] | invalid[required]).any(axis=1).to_numpy()
+    has_blank = blank.any(axis=1).to_numpy()
+    has_invalid = invalid.any(axis=1).to_numpy()
+
+    validation_result = np.select(
+        [has_required_problem, has_blank | has_invalid],
+        ["INVALID", "VALID-FOR-NECESSARY-FIELDS"],
+        default="VALID",
+    )
+
+    size = len(df_collection_csv)
+    report = pd.DataFrame({
+        "RowNumber": df_collection_csv.index + 1,
+        "ChainId": get_column_values(df_collection_csv, "ChainId"),
+        "LastUpdate": get_column_values(df_collection_csv, "LastUpdate"),
+        "ValitationResult": validation_result,
+        "InvalidColumns": join_column_names(invalid, has_invalid),
+        "BlankColumns": join_column_names(blank, has_blank),
+    }, index=range(size))
+
+    return report.to_dict("records")
+
+
+def add_enrichment_flags(df_collection_csv, blank, invalid):
+    """
+    has_status: Status is not blank (get_status raises before any write).
+    has_coordinates: Latitude and Longitude are finite numbers, so a
+    synthetic_location_id can be computed.
+    """
+    flags = {}
+    if "Status" in df_collection_csv.columns:
+        flags["has_status"] = ~blank["Status"]
+    if set(NUMERIC_FIELDS).issubset(df_collection_csv.columns):
+        bad = blank[NUMERIC_FIELDS] | invalid[NUMERIC_FIELDS]
+        for col in NUMERIC_FIELDS:
+            bad[col] |= get_infinite_mask(df_collection_csv[col], bad[col])
+        flags["has_coordinates"] = ~bad.any(axis=1)
+    return df_collection_csv.assign(**flags)
 
-    for idx, row in df_collection_csv.iterrows():
 
-        validation_result, blank_cols, invalid_cols = validate_row(row)
+def get_infinite_mask(values, bad):
+    """
+    True for the valid number cells that are infinite (e.g. "inf"), which
+    truncate() cannot take. Values to_numeric cannot parse are checked
+    again with float(), as in get_invalid_mask.
+    """
+    values = values.astype(object)
+    numbers = pd.to_numeric(values, errors="coerce")
+    infinite = np.isinf(numbers.to_numpy(dtype=np.float64, na_value=np.nan))
+    unparsed = (numbers.isna() & ~bad).to_numpy()
+    if unparsed.any():
+        infinite[unparsed] = values[unparsed].map(lambda value: np.isinf(float(value))).to_numpy(dtype=bool)
+    return pd.Series(infinite & ~bad.to_numpy(), index=values.index)
 
-        rows.append({
-            "RowNumber": idx + 1,
-            "ChainId": row.get("ChainId", None),
-            "LastUpdate": row.get("LastUpdate", None),
-            "ValitationResult": validation_result,
-            "InvalidColumns": ", ".join(invalid_cols),
-            "BlankColumns": ", ".join(blank_cols)
-        })
 
-    return rows
+def get_column_values(df_collection_csv, column):
+    if column not in df_collection_csv.columns:
+        return [None] * len(df_collection_csv)
+    return df_collection_csv[column].tolist()
+
+
+def get_blank_mask(df_collection_csv):
+    """
+    True for the null cells and the str cells with only whitespace.
+    """
+    blank = df_collection_csv.isna()
+    for col in df_collection_csv.columns:
+        if is_numeric_dtype(df_collection_csv[col]) or is_bool_dtype(df_collection_csv[col]):
+            continue
+        values = df_collection_csv[col]
+        if not isinstance(values.dtype, pd.StringDtype):
+            values = str_values(values)
+        blank[col] |= (values.str.strip() == "").fillna(False).astype(bool)
+    return blank
+
+
+def get_invalid_mask(df_collection_csv, blank):
+    """
+    True for the non-blank Latitude / Longitude cells that are not numbers.
+    Values to_numeric cannot parse are checked again with float() (which
+    also takes e.g. "nan" or "1_000").
+    """
+    invalid = pd.DataFrame(False, index=df_collection_csv.index, columns=df_collection_csv.columns)
+    for col in NUMERIC_FIELDS:
+        if col not in df_collection_csv.columns or is_numeric_dtype(df_collection_csv[col]):
+            continue
+        values = df_collection_csv[col].astype(object)
+        suspect = pd.to_numeric(values, errors="coerce").isna() & ~blank[col]
+        if suspect.any():
+            invalid.loc[suspect, col] = values[suspect].map(is_invalid_number).astype(bool)
+    return invalid
+
+
+def join_column_names(mask, has_any):
+    """
+    ", ".join of the True columns of each row ("" for the rows without).
+    """
+    names = pd.Series("", index=mask.index, dtype=object)
+    if has_any.any():
+        flagged = mask[has_any]
+        names[has_any] = flagged.dot(flagged.columns.astype(str) + ", ").str[:-2]
+    return names.tolist()
+
+
+def get_quality_summary(blank, invalid):
+    """
+    Blank and invalid cells of each column, with their completeness.
+    """
+    return with_completeness(get_quality_counts(blank, invalid))
+
+
+def get_quality_counts(blank, invalid):
+    """
+    Blank and invalid cells of each column.
+    """
+    return pd.DataFrame({
+        "Column": blank.columns.astype(str),
+        "RowCount": len(blank),
+        "BlankCount": blank.sum().to_numpy(dtype=np.int64),
+        "InvalidCount": invalid.sum().to_numpy(dtype=np.int64),
+    })
+
+
+def with_completeness(counts):
+    """
+    Completeness: share of the cells of the column neither blank nor invalid.
+    """
+    row_count = counts["RowCount"].to_numpy(dtype=np.float64)
+    valid_count = row_count - counts["BlankCount"] - counts["InvalidCount"]
+    return counts.assign(Completeness=np.divide(valid_count, row_count, out=np.zeros(len(counts)), where=row_count > 0))
 
 
 def save_rows_in_database(session, rows, collection_id, file_name):
-    for row in rows:
-        quality_report = get_quality_report_object(row, collection_id, file_name)
-        QualityReport.upsert(session=session, data=quality_report)  
+    quality_reports = [get_quality_report_object(row, collection_id, file_name) for row in rows]
+    return QualityReport.bulk_upsert(session, quality_reports)
+
+
+def save_summary_in_database(session, summary, collection_id, file_name):
+    summaries = [get_quality_summary_object(row, collection_id, file_name) for row in summary.to_dict("records")]
+    return QualityReportSummary.bulk_upsert(session, summaries)
 
 
 def get_quality_report_object(row, collection_id, file_name):
+    chain_id = row.get("ChainId")
+    scrape_date = parse_dateflex(row.get("LastUpdate"))
+    
     quality_report_data = {
         "file_name": file_name,
         "collection_id": collection_id,
         "row_number": row.get("RowNumber"),
-        "chain_id": row.get("ChainId"),
-        "scrape_date": row.get("LastUpdate"),
+        "chain_id": None if pd.isna(chain_id) else str(chain_id),
+        "scrape_date": None if pd.isna(scrape_date) else scrape_date,
         "valitation_result": row.get("ValitationResult"),
         "invalid_columns": row.get("InvalidColumns", ""),
         "blank_columns": row.get("BlankColumns", "")
     }
 
-    return quality_report_data
-
-
-def validate_row(row):
-
-    blank_cols = []
-    invalid_cols = []
-
-    for col, value in row.items():
-        if is_empty(value):
-            blank_cols.append(col)
-
-    if "Latitude" in row and not is_empty(row["Latitude"]):
-        if is_invalid_number(row["Latitude"]):
-            invalid_cols.append("Latitude")
+    return clean_dict_for_sqlalchemy(quality_report_data)
 
-    if "Longitude" in row and not is_empty(row["Longitude"]):
-        if is_invalid_number(row["Longitude"]):
-            invalid_cols.append("Longitude")
 
-    has_required_blank = any(col in REQUIRED_FIELDS for col in blank_cols)
-    has_required_invalid = any(col in REQUIRED_FIELDS for col in invalid_cols)
-
-    if has_required_blank or has_required_invalid:
-        validation_result = "INVALID"
-
-    else:
-        if blank_cols or invalid_cols:
-            validation_result = "VALID-FOR-NECESSARY-FIELDS"
-        else:
-            validation_result = "VALID"
-
-    return validation_result, blank_cols, invalid_cols
+def get_quality_summary_object(row, collection_id, file_name):
+    return {
+        "file_name": file_name,
+        "collection_id": collection_id,
+        "column_name": row["Column"],
+        "row_count": int(row["RowCount"]),
+        "blank_count": int(row["BlankCount"]),
+        "invalid_count": int(row["InvalidCount"]),
+        "completeness": float(row["Completeness"]),
+    }
 
 
 def is_empty(value):
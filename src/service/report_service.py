@@ -1,67 +1,346 @@
 import pandas as pd
+import numpy as np
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
 from utils.cell_util import midpoint, full_address, parse_dateflex
-from service.chain_scrapper_service import upsert_chain_scraper
-from service.location_service import get_or_create_location, get_location_by_synthetic_location_id, get_status
-from service.location_event_service import get_last_event, create_current_event, get_all_by_date_range
-from service.us_region_service import get_us_region_by_zip
+from service.chain_scrapper_service import bulk_upsert_chain_scrapers
+from service.location_service import get_or_create_location, get_status, normalize_collection, add_synthetic_location_ids
+from service.location_event_service import get_last_event, get_last_events, get_row_scrape_date, create_current_event, stream_with_location_by_date_range
+from service.us_region_service import get_us_region_by_zip, get_zip_region_table
+from service.location_staging_service import LocationStagingLoader
+from service.location_index import LocationIndex
+from service.db_service import deferred_commit, get_db_session, init_worker_process
+from service.quality_report_service import QualityReportCollector
+from utils.csv_schema import COLLECTION_SCHEMA
 
 logging.basicConfig(level=logging.INFO)
 
+OUTPUT_CSV_CHUNK_SIZE = 1000
+
+# Columns of the collection rows read by generate_collection_outputs: only
+# these are sent to the worker processes of the parallel report
+ENRICHMENT_COLUMNS = COLLECTION_SCHEMA.columns + ["has_status", "has_coordinates", "synthetic_location_id"]
+
 
 def generate_report_for_chain_scraper(db_session, collection_id, file_key, df_chain_scraper_csv, df_collection_csv):
+    """
+    Only the last scrape (latest Time) of each chain and Date is reported.
+    The Added / Removed counts of each (ChainId, LastUpdate) are taken once
+    from df_collection_csv, and the running run_check_count of each chain
+    is a cumulative sum over its scrapes: each scrape adds its Added rows
+    before being saved, and removes its Removed rows after.
+    """
     logging.info(f"Generate chain_scraper report for collection_id {collection_id}")
     df_chain_scraper_sorted = df_chain_scraper_csv.sort_values(by=['ChainId', 'Date', 'Time'])
 
-    outputs_chain_scraper = []
+    df_outputs = get_last_scrape_of_each_chain_day(df_chain_scraper_sorted).copy()
+    if df_outputs.empty:
+        return create_output_csv_file([], file_key)
+
+    chain_ids = df_outputs['ChainId'].to_numpy()
+    is_new_chain = np.ones(len(chain_ids), dtype=bool)
+    is_new_chain[1:] = chain_ids[1:] != chain_ids[:-1]
+
+    status_counts = get_status_counts(df_collection_csv)
+    counts = np.array(
+        [status_counts.get(key, (0, 0)) for key in zip(df_outputs['ChainId'], df_outputs['Date'])],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    added_count = counts[:, 0]
+    removed_count = counts[:, 1] - added_count
     
-    run_check_count = 0
-    last_chain_id = None
-    for idx, row in df_chain_scraper_sorted.iterrows():
-        chain_id = row['ChainId']
-        date = row['Date']
-        
-        filtered_collection = df_collection_csv[
-            (df_collection_csv['ChainId'] == chain_id) & 
-            (df_collection_csv['LastUpdate'] == date)
-        ].sort_values(by=["LastUpdate", "Status"])
-
-        if chain_id != last_chain_id:
-            logging.info(f"Generate data for ChainId {chain_id}")
-            last_chain_id = chain_id
-            run_check_count = 0
-        elif verify_if_next_date_is_same(df_chain_scraper_sorted, idx):
-            continue
-        
-        old_run_check_count = run_check_count
-        chain_scraper, run_check_count = create_chain_scraper(db_session, collection_id, row, filtered_collection, run_check_count)
-        
-        if chain_scraper["run_check_count"] > old_run_check_count:
-            row['ActualRunCheck'] = get_actual_run_check_cell_value(chain_scraper)
-            row['DiffRunCheck'] = get_diff_run_check_cell_value(chain_scraper)
-            row['RunCheckStatus'] = get_run_check_status_cell_value(chain_scraper)
-            
-        outputs_chain_scraper.append(row)
+    chain_run = np.cumsum(is_new_chain)
+    balance = pd.Series(added_count - removed_count).groupby(chain_run).cumsum().to_numpy()
+    run_check_count = balance + removed_count
+
+    bulk_upsert_chain_scrapers(db_session, collection_id, df_outputs, run_check_count)
+
+    has_added = added_count > 0
+    if has_added.any():
+        set_run_check_columns(df_outputs, has_added, run_check_count)
                 
-    return create_output_csv_file(outputs_chain_scraper, file_key)
+    return create_output_csv_file(df_outputs, file_key)
 
 
-def generate_report_for_collection(db_session, collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_csv):
+def generate_report_for_collection(db_session, collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_csv, bulk_load=False, transactional=False, commit_every=None, cache_locations=False, batch_last_events=False):
+    """
+    With bulk_load, new locations and events are staged and written with
+    COPY + merge (see location_staging_service) each time the
+    (ChainId, LastUpdate) group changes, instead of one upsert per row.
+    Rows of a group only look up events of earlier dates, so flushing
+    between groups keeps the same results as the row-by-row writes.
+
+    With transactional, the writes of a whole chain (or of every
+    commit_every rows, when given) share one commit instead of up to five
+    commits per row, and each row runs in a savepoint so a failed row is
+    rolled back alone.
+
+    With cache_locations (only with transactional), the locations of each
+    chain are loaded once into a LocationIndex and the rows are matched
+    against it, instead of querying by partner_hash_id and
+    synthetic_location_id on every row.
+
+    With batch_last_events (only with transactional), the previous event of
+    the rows of each (ChainId, LastUpdate) group is resolved with one
+    get_last_events query when the group starts (and again after a
+    commit_every commit). Rows only look up events of earlier dates, so
+    the events written by the group itself do not change the result. A row
+    whose location does not match the synthetic id of the row (found by
+    HashId after moving) falls back to get_last_event.
+    """
     logging.info(f"Generate report for collection_id {collection_id} between {start_scraper_date} and {end_scraper_date}")
-    df_collection_csv = df_collection_csv.sort_values(by=['ChainId', 'LastUpdate', 'Status', 'Longitude', 'Latitude'])
+    midpoint_date = midpoint(start_scraper_date, end_scraper_date)
+    
+    loader = LocationStagingLoader() if bulk_load else None
+    location_index = LocationIndex() if cache_locations else None
+    
+    with deferred_commit(db_session) if transactional else nullcontext():
+        outputs_collection = generate_collection_outputs(
+            db_session, df_collection_csv, midpoint_date, loader, location_index, transactional, commit_every, batch_last_events
+        )
+        
+    return create_output_csv_file(outputs_collection.values(), file_key)
+
+
+def generate_collection_report_with_quality(db_session, collection_id, file_key, quality_file_key, start_scraper_date, end_scraper_date, df_collection_csv, quality_report_detail=True, workers=None, source_file=None, **options):
+    """
+    Quality report and enriched report of a collection file in one pass:
+    the file is validated column-wise, and the validation decides which
+    rows the enrichment skips (blank Status, or no coordinates for a
+    location not found by HashId) instead of letting them raise. With
+    source_file (the file df_collection_csv was read from), the blanks of
+    the columns it was read without are reported too.
+    With workers, the enrichment runs in parallel, and a partition that
+    failed as a whole raises once the quality report is saved (its chains
+    are missing from the enriched report). options (transactional,
+    commit_every, ...) are those of generate_report_for_collection.
+    """
+    quality_report = QualityReportCollector(quality_report_detail, source_file)
+    df_collection_csv = quality_report.validate(df_collection_csv)
     
+    chain_errors = {}
+    if workers:
+        chain_errors = generate_report_for_collection_in_parallel(collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_csv, workers=workers, **options)
+    else:
+        generate_report_for_collection(db_session, collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_csv, **options)
+    
+    result = quality_report.save(db_session, collection_id, quality_file_key)
+    
+    failed_chain_ids = [chain_id for chain_id, error in chain_errors.items() if isinstance(error, Exception)]
+    if failed_chain_ids:
+        raise RuntimeError(f"Report failed for ChainIds {failed_chain_ids} - Error: {chain_errors[failed_chain_ids[0]]}")
+    
+    return result
+
+
+def generate_report_for_collection_in_chunks(db_session, collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_chunks, bulk_load=False, transactional=False, commit_every=None, cache_locations=False, batch_last_events=False):
+    """
+    Streaming generate_report_for_collection: df_collection_chunks is an
+    iterable of DataFrames (see read_csv_in_chain_chunks), each processed
+    on its own and its outputs appended to the enriched CSV before the next
+    one is read, so memory is bounded by the chunk size instead of the file.
+    
+    Every chunk must hold all the rows of its chains. The outputs follow
+    the order of the chains in the file (sorted within each chunk), and an
+    output key is only deduplicated within its chunk.
+    """
+    logging.info(f"Generate report in chunks for collection_id {collection_id} between {start_scraper_date} and {end_scraper_date}")
+    midpoint_date = midpoint(start_scraper_date, end_scraper_date)
+    
+    loader = LocationStagingLoader() if bulk_load else None
+    location_index = LocationIndex() if cache_locations else None
+    
+    header = True
+    row_count = 0
+    with deferred_commit(db_session) if transactional else nullcontext():
+        for df_chunk in df_collection_chunks:
+            row_count += len(df_chunk)
+            outputs_collection = generate_collection_outputs(
+                db_session, df_chunk, midpoint_date, loader, location_index, transactional, commit_every, batch_last_events
+            )
+            if outputs_collection:
+                append_output_csv_file(list(outputs_collection.values()), file_key, header)
+                header = False
+            logging.info(f"Processed {row_count} rows for collection_id {collection_id}")
+    
+    if header:
+        return create_output_csv_file([], file_key)
+    logging.info(f"Arquivo CSV '{file_key}' criado com sucesso.")
+
+
+def generate_report_for_collection_in_parallel(collection_id, file_key, start_scraper_date, end_scraper_date, df_collection_csv, workers=None, bulk_load=False, transactional=False, commit_every=None, cache_locations=False, batch_last_events=False):
+    """
+    Parallel generate_report_for_collection: the rows are split into
+    partitions of whole chains (see get_chain_partitions), each run by
+    generate_collection_outputs in a pool of workers processes
+    (os.cpu_count() by default), with its own engine and session.
+
+    The outputs are written in the order of the partitions (by their first
+    ChainId), which is the serial order when no chains share a location.
+    A partition that fails as a whole does not stop the others. Returns
+    {ChainId: error} with the rows with error of each chain, or the
+    exception of its partition.
+    """
+    logging.info(f"Generate report in parallel for collection_id {collection_id} between {start_scraper_date} and {end_scraper_date}")
     midpoint_date = midpoint(start_scraper_date, end_scraper_date)
+    options = {
+        "bulk_load": bulk_load,
+        "transactional": transactional,
+        "commit_every": commit_every,
+        "cache_locations": cache_locations,
+        "batch_last_events": batch_last_events,
+    }
+    
+    df_collection_csv = add_synthetic_location_ids(df_collection_csv)
+    df_collection_csv = df_collection_csv[[column for column in ENRICHMENT_COLUMNS if column in df_collection_csv.columns]]
+    partitions = [df_collection_csv[is_partition] for is_partition in get_chain_partitions(df_collection_csv)]
+    
+    outputs_collection = []
+    chain_errors = {}
+    # spawn, not fork: the consumer threads (heartbeat, ack buffer, ...) may
+    # hold locks at fork time, which would deadlock the worker processes
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=init_worker_process) as executor:
+        futures = [executor.submit(generate_partition_outputs, df_partition, midpoint_date, options) for df_partition in partitions]
+        for df_partition, future in zip(partitions, futures):
+            try:
+                outputs, error_counts = future.result()
+            except Exception as e:
+                logging.error(f"Failed ChainIds {df_partition['ChainId'].unique().tolist()} - Error: {e}")
+                chain_errors.update(dict.fromkeys(df_partition["ChainId"].unique().tolist(), e))
+                continue
+            outputs_collection.extend(outputs)
+            chain_errors.update(error_counts)
+    
+    row_counts = df_collection_csv["ChainId"].value_counts(dropna=False)
+    for chain_id, error in chain_errors.items():
+        logging.info(f"ChainId {chain_id}: {error} error(s) in {row_counts.get(chain_id, 0)} rows")
+    
+    create_output_csv_file(outputs_collection, file_key)
+    return chain_errors
+
+
+def generate_partition_outputs(df_partition, midpoint_date, options):
+    """
+    Runs in a worker process of generate_report_for_collection_in_parallel.
+    Returns the outputs and the rows with error of each chain.
+    """
+    db_session = get_db_session()
+    loader = LocationStagingLoader() if options["bulk_load"] else None
+    location_index = LocationIndex() if options["cache_locations"] else None
+    error_counts = {}
+    try:
+        with deferred_commit(db_session) if options["transactional"] else nullcontext():
+            outputs_collection = generate_collection_outputs(
+                db_session, df_partition, midpoint_date, loader, location_index,
+                options["transactional"], options["commit_every"], options["batch_last_events"], error_counts
+            )
+    finally:
+        db_session.close()
+    
+    return list(outputs_collection.values()), error_counts
 
+
+def get_chain_partitions(df_collection_csv):
+    """
+    Boolean masks of the rows of each partition, in ChainId order. Chains
+    that share a HashId or a synthetic_location_id (e.g. two stores at the
+    same coordinates) read and write the same locations and events, so
+    they are kept in the same partition, where they run in ChainId order
+    as they would serially.
+    """
+    codes, _ = pd.factorize(df_collection_csv["ChainId"], sort=True, use_na_sentinel=False)
+    partition_of = list(range(codes.max() + 1 if len(codes) else 0))
+
+    def find(code):
+        while partition_of[code] != code:
+            partition_of[code] = partition_of[partition_of[code]]
+            code = partition_of[code]
+        return code
+
+    key_columns = [column for column in ("HashId", "synthetic_location_id") if column in df_collection_csv.columns]
+    for column in key_columns:
+        first_code_by_key = {}
+        for code, key in zip(codes.tolist(), df_collection_csv[column].tolist()):
+            if not isinstance(key, str):
+                continue
+            first_code = first_code_by_key.setdefault(key, code)
+            # The lowest code is the root, so partitions keep the ChainId order
+            roots = sorted((find(first_code), find(code)))
+            partition_of[roots[1]] = roots[0]
+
+    partitions = np.array([find(code) for code in range(len(partition_of))], dtype=np.int64)
+    row_partitions = partitions[codes] if len(codes) else codes
+    return [row_partitions == partition for partition in np.unique(partitions)]
+
+
+def generate_collection_outputs(db_session, df_collection_csv, midpoint_date, loader=None, location_index=None, transactional=False, commit_every=None, batch_last_events=False, error_counts=None):
+    """
+    Creates the locations and events of the rows and returns their outputs
+    by generate_output_key. Pending staged rows are flushed, and with
+    transactional the writes are committed, before returning. The rows with
+    error of each ChainId are counted in error_counts, when given.
+
+    location_index and batch_last_events need transactional: without it
+    every row commits, which expires the cached locations and the
+    prefetched events.
+    """
+    if location_index is not None and not transactional:
+        raise ValueError("cache_locations requires transactional")
+    if batch_last_events and not transactional:
+        raise ValueError("batch_last_events requires transactional")
+    
+    df_collection_csv = df_collection_csv.sort_values(by=['ChainId', 'LastUpdate', 'Status', 'Longitude', 'Latitude'])
+    df_collection_csv = normalize_collection(df_collection_csv)
+    df_collection_csv = add_synthetic_location_ids(df_collection_csv)
+    
     outputs_collection = {}
     last_chain_id = None
 
+    group_synthetic_ids = get_group_synthetic_ids(df_collection_csv) if batch_last_events else None
+    last_events = {}
+    last_group = None
+    prefetch_pending = False
+
+    last_commit_chain_id = None
+    rows_since_commit = 0
+
     error_count = 0
+    skipped_count = 0
     chain_id_count = 0
     for c_idx, c_row in df_collection_csv.iterrows():
+        group = (c_row["ChainId"], c_row["LastUpdate"])
+        if group != last_group:
+            if loader is not None:
+                loader.flush(db_session)
+            prefetch_pending = group_synthetic_ids is not None
+            last_group = group
+        
+        if not c_row.get("has_status", True):
+            skipped_count += 1
+            continue
+        
+        if transactional:
+            if c_row["ChainId"] != last_commit_chain_id or (commit_every and rows_since_commit >= commit_every):
+                db_session.commit()
+                last_commit_chain_id = c_row["ChainId"]
+                rows_since_commit = 0
+                # The commit expires the prefetched events, so they are fetched again
+                prefetch_pending = group_synthetic_ids is not None
+            rows_since_commit += 1
+        
+        if prefetch_pending:
+            last_events = prefetch_last_events(db_session, group, group_synthetic_ids)
+            prefetch_pending = False
+        
+        savepoint = db_session.begin_nested() if transactional else None
+        staged_mark = loader.mark() if loader is not None else None
         try:
             chain_id = c_row["ChainId"]
-            last_update = parse_dateflex(c_row["LastUpdate"])
+            last_update = get_row_scrape_date(c_row)
             
             if chain_id != last_chain_id:
                 logging.info(f"Generate data for ChainId {chain_id}")
@@ -72,20 +351,81 @@ def generate_report_for_collection(db_session, collection_id, file_key, start_sc
                 
                 chain_id_count = 0
                 
-            location, suspected_hash_change = get_or_create_location(db_session, c_row, midpoint_date)
-            last_event = get_last_event(db_session, c_row, location)
+            location, suspected_hash_change = get_or_create_location(db_session, c_row, midpoint_date, loader, location_index)
+            if location is None:
+                if savepoint is not None:
+                    savepoint.commit()
+                skipped_count += 1
+                continue
+            
+            last_event_key = (location.synthetic_location_id, last_update)
+            if last_event_key in last_events:
+                last_event = last_events[last_event_key]
+            else:
+                last_event = get_last_event(db_session, c_row, location)
             location.update_last_event_date(db_session, midpoint_date)
             
-            current_event = create_current_event(db_session, c_row, location, last_event, suspected_hash_change, midpoint_date)    
+            current_event = create_current_event(db_session, c_row, location, last_event, suspected_hash_change, midpoint_date, loader)    
             chain_id_count += 1
+            
+            # The writes of the row are kept even if building its output fails
+            if savepoint is not None:
+                savepoint.commit()
+                savepoint = None
                         
             us_region = get_us_region_by_zip(db_session, location.zip)
             output = get_output(location, current_event, last_event, us_region)
             outputs_collection[generate_output_key(current_event)] = output
         except Exception as e:
+            # Leaves the session usable for the next rows
+            if savepoint is not None:
+                savepoint.rollback()
+                # The staged rows of the row are rolled back with it
+                if loader is not None:
+                    loader.discard_since(staged_mark)
+            elif not transactional:
+                db_session.rollback()
             error_count += 1
-        
-    return create_output_csv_file(outputs_collection.values(), file_key)
+            if error_counts is not None:
+                error_counts[c_row["ChainId"]] = error_counts.get(c_row["ChainId"], 0) + 1
+    
+    if loader is not None:
+        loader.flush(db_session)
+    
+    if transactional:
+        db_session.commit()
+    
+    if skipped_count > 0:
+        logging.info(f"Skipped {skipped_count} rows without Status or coordinates")
+    
+    return outputs_collection
+
+
+def get_group_synthetic_ids(df_collection_csv):
+    group_synthetic_ids = {}
+    if "synthetic_location_id" not in df_collection_csv.columns:
+        return group_synthetic_ids
+    
+    for chain_id, last_update, synthetic_id in zip(
+        df_collection_csv["ChainId"], df_collection_csv["LastUpdate"], df_collection_csv["synthetic_location_id"]
+    ):
+        if isinstance(synthetic_id, str):
+            group_synthetic_ids.setdefault((chain_id, last_update), []).append(synthetic_id)
+    return group_synthetic_ids
+
+
+def prefetch_last_events(db_session, group, group_synthetic_ids):
+    chain_id, last_update = group
+    try:
+        scrape_date = parse_dateflex(last_update)
+        pairs = [(synthetic_id, scrape_date) for synthetic_id in group_synthetic_ids.get(group, [])]
+        # Savepoint: a failed query must not abort the writes pending in the session
+        with db_session.begin_nested():
+            return get_last_events(db_session, pairs)
+    except Exception as e:
+        # The rows of the group fall back to get_last_event
+        logging.warning(f"Could not prefetch last events for ChainId {chain_id} and LastUpdate {last_update} - Error: {e}")
+        return {}
 
 
 def generate_output_key(event):
@@ -94,28 +434,52 @@ def generate_output_key(event):
 
 def direct_report(db_session, start_scraper_date, end_scraper_date):
     logging.info(f"Generate direct report between {start_scraper_date} and {end_scraper_date}")
-    location_events = get_all_by_date_range(db_session, start_scraper_date, end_scraper_date)
+    # Loaded before the stream opens its cursor; the regions are then looked
+    # up in memory by zip instead of being joined on the text zip
+    get_zip_region_table(db_session)
+    rows = stream_with_location_by_date_range(db_session, start_scraper_date, end_scraper_date)
     
-    outputs = []
-    map_location = {}
-    for location_event in location_events:
-        location = get_location_by_synthetic_location_id(db_session, location_event.synthetic_location_id)
-        last_event = location_event.last_location_event
-        us_region = get_us_region_by_zip(db_session, location.zip)
-        outputs.append(get_output(location, location_event, last_event, us_region))
+    outputs = (
+        get_output(location, location_event, last_event, get_us_region_by_zip(db_session, location.zip))
+        for location_event, location, last_event in rows
+    )
     
-    return create_output_csv_file(outputs, f"Direct-Report-{start_scraper_date}-{end_scraper_date}.csv")
+    return create_output_csv_file_in_chunks(outputs, f"Direct-Report-{start_scraper_date}-{end_scraper_date}.csv")
+
+
+def get_last_scrape_of_each_chain_day(df_chain_scraper_sorted):
+    """
+    Keeps only the last row (latest Time) of each ChainId and Date, in the
+    order of df_chain_scraper_sorted.
+    """
+    return df_chain_scraper_sorted.groupby(['ChainId', 'Date'], sort=False, dropna=False).tail(1)
 
 
-def verify_if_next_date_is_same(df_chain_scraper, index):
-    last_position = len(df_chain_scraper) - 1
+def get_status_counts(df_collection_csv):
+    """
+    {(ChainId, LastUpdate): (added_count, total_count)}
+    """
+    is_added = (df_collection_csv['Status'] == "Added").astype(np.int64)
+    counts = is_added.groupby([df_collection_csv['ChainId'], df_collection_csv['LastUpdate']]).agg(['sum', 'size'])
+    return dict(zip(counts.index, zip(counts['sum'], counts['size'])))
+
+
+def set_run_check_columns(df_outputs, has_added, run_check_count):
+    us_location_count = df_outputs['UsLocationCount'].to_numpy()
+    is_empty = run_check_count == 0
     
-    if index == last_position:
-        return False
+    actual_run_check = np.where(is_empty, "N/A", run_check_count.astype(object))
+    diff_run_check = np.where(is_empty, "N/A", (us_location_count - run_check_count).astype(object))
+    run_check_status = np.where(is_empty, "N/A", np.where(us_location_count == run_check_count, "MATCHED", "UNMATCHED"))
     
-    current_chain_scraper = df_chain_scraper.iloc[index]
-    next_chain_scraper = df_chain_scraper.iloc[index +1]
-    return next_chain_scraper["Date"] == current_chain_scraper["Date"]
+    for column, values in (
+        ('ActualRunCheck', actual_run_check),
+        ('DiffRunCheck', diff_run_check),
+        ('RunCheckStatus', run_check_status),
+    ):
+        column_values = np.full(len(df_outputs), np.nan, dtype=object)
+        column_values[has_added] = values[has_added]
+        df_outputs[column] = column_values
 
 
 def get_output(location, current_event, last_event, us_region): 
@@ -142,33 +506,31 @@ def get_explain_window(current_event, last_event):
     return "Scrape " + str(last_event.scrape_date) + " -> " + str(current_event.scrape_date)
 
 
-def create_chain_scraper(db_session, collection_id, row, filtered_collection, run_check_count):
-    added_count = len(filtered_collection[filtered_collection['Status'] == "Added"])
-    removed_count = len(filtered_collection) - added_count
-
-    run_check_count += added_count
-    chain_scraper = upsert_chain_scraper(db_session, collection_id, row, run_check_count)
+def create_output_csv_file_in_chunks(outputs, csv_name, chunk_size=OUTPUT_CSV_CHUNK_SIZE):
+    """
+    Same file as create_output_csv_file, written chunk_size outputs at a
+    time so outputs can be a generator of any size.
+    """
+    chunk = []
+    header = True
+    for output in outputs:
+        chunk.append(output)
+        if len(chunk) >= chunk_size:
+            append_output_csv_file(chunk, csv_name, header)
+            chunk = []
+            header = False
     
-    run_check_count -= removed_count
-    return chain_scraper, run_check_count
-
-
-def get_actual_run_check_cell_value(chain_scraper):
-    if chain_scraper["run_check_count"] == 0:
-        return str("N/A")
-    return chain_scraper["run_check_count"]
-
+    if chunk or header:
+        append_output_csv_file(chunk, csv_name, header)
+    logging.info(f"Arquivo CSV '{csv_name}' criado com sucesso.")
 
-def get_diff_run_check_cell_value(chain_scraper):
-    if chain_scraper["run_check_count"] == 0:
-        return str("N/A")
-    return chain_scraper["us_location_count"] - chain_scraper["run_check_count"]
 
-
-def get_run_check_status_cell_value(chain_scraper):
-    if chain_scraper["run_check_count"] == 0:
-        return str("N/A")
-    return "MATCHED" if chain_scraper["us_location_count"] == chain_scraper["run_check_count"]  else "UNMATCHED"
+def append_output_csv_file(outputs, csv_name, header):
+    try:
+        df = pd.DataFrame(outputs)
+        df.to_csv(csv_name, index=False, encoding='utf-8', mode='w' if header else 'a', header=header)
+    except Exception as e:
+        raise RuntimeError(f"Error generating export csv - Erro: {e}")
 
 
 def create_output_csv_file(outputs, csv_name):
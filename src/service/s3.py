@@ -1,7 +1,9 @@
 import datetime
+import json
 import logging
 import os
 from pathlib import Path
+from urllib.parse import unquote_plus
 from typing import Optional
 
 import boto3
@@ -307,6 +309,7 @@ class S3CsvService:
         folder: str,
         recursive: bool = True,
         bucket_name: str = None,
+        suffix: str = ".csv",
     ) -> list[str]:
         """
         List all CSV files in a specific S3 folder.
@@ -316,6 +319,7 @@ class S3CsvService:
         :param recursive: If True, lists CSV files in subfolders as well.
                          If False, only lists files directly in the folder (not in subfolders).
         :param bucket_name: Specific bucket to use. If None, uses the bucket defined in __init__.
+        :param suffix: Extension of the files to list (case-insensitive). If None, lists every file.
         :return: List of file keys (full paths from S3 root) for all CSV files found.
         """
         # Use provided bucket or default to self.bucket_name
@@ -351,7 +355,7 @@ class S3CsvService:
                         continue
                     
                     # Check if it's a CSV file
-                    if key.lower().endswith(".csv"):
+                    if suffix is None or key.lower().endswith(suffix):
                         # If not recursive, only include files directly in the folder (no subfolders)
                         if not recursive:
                             # Count "/" after the prefix to determine if it's in a subfolder
@@ -372,6 +376,75 @@ class S3CsvService:
         return csv_files
 
 
+    def resolve_event_file_keys(
+        self,
+        payload: dict,
+        folder: str,
+        full_prefix_sweep: bool = False,
+        suffix: str = ".csv",
+    ) -> list[str]:
+        """
+        Resolve which files an SQS message refers to.
+
+        For S3 notifications (optionally wrapped in SNS), returns only the
+        created objects named in Records[].s3.object.key that live in this
+        bucket under the folder. The full-prefix sweep (list every CSV in the
+        folder) only happens when asked explicitly, either by the caller or
+        by a message like {"FullPrefixSweep": true}.
+
+        :param payload: Parsed message body.
+        :param folder: Folder path in S3 (e.g., "raw" or "raw/").
+        :param full_prefix_sweep: If True, ignores the event and lists the folder.
+        :param suffix: Extension of the files to process, as in list_csv_files. If None, every file.
+        :return: List of file keys (full paths from S3 root).
+        """
+        if isinstance(payload, dict) and payload.get("Type") == "Notification":
+            try:
+                payload = json.loads(payload.get("Message") or "{}")
+            except json.JSONDecodeError:
+                logger.warning("SNS message is not JSON: %s", payload.get("Message"))
+                payload = {}
+
+        if not isinstance(payload, dict):
+            payload = {}
+
+        if full_prefix_sweep or payload.get("FullPrefixSweep"):
+            logger.info(f"Full prefix sweep requested for s3://{self.bucket_name}/{folder}")
+            return self.list_csv_files(folder, suffix=suffix)
+
+        records = payload.get("Records")
+        if not records:
+            logger.warning(f"Message is not an S3 event, nothing to process: {payload}")
+            return []
+
+        prefix = f"{folder.strip('/')}/"
+        file_keys = []
+        for record in records:
+            if not record.get("eventName", "").startswith("ObjectCreated"):
+                continue
+
+            s3_info = record.get("s3", {})
+            bucket = s3_info.get("bucket", {}).get("name")
+            if bucket and self.bucket_name and bucket != self.bucket_name:
+                logger.warning(f"Ignoring event for another bucket: {bucket}")
+                continue
+
+            # Keys in S3 events are URL-encoded (spaces come as "+")
+            key = unquote_plus(s3_info.get("object", {}).get("key", ""))
+            if not key.startswith(prefix) or key.endswith("/"):
+                logger.info(f"Ignoring event for key outside of {prefix}: {key}")
+                continue
+
+            if suffix is not None and not key.lower().endswith(suffix):
+                logger.info(f"Ignoring event for key without {suffix} suffix: {key}")
+                continue
+
+            if key not in file_keys:
+                file_keys.append(key)
+
+        logger.info(f"Files from S3 event: {file_keys}")
+        return file_keys
+
     def download_csv_file(
         self,
         file_name: str,
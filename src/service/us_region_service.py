@@ -1,25 +1,128 @@
 import pandas as pd
+import numpy as np
 import logging
+import threading
+from collections import namedtuple
 from models import UsRegion
+from utils.data_util import clean_dict_for_sqlalchemy
+
+ZipRegion = namedtuple("ZipRegion", ["zip", "region", "division"])
+
+_zip_region_table = None
+_zip_region_table_version = 0
+_zip_region_table_lock = threading.Lock()
+
+# Every 5-digit zip
+ZIP_TABLE_SIZE = 100000
+
+
+class ZipRegionTable:
+    """
+    Read-only zip -> (region, division) lookup of the us_region table.
+
+    Each distinct (region, division) pair is stored once, and an int16
+    array indexed by the integer zip holds its position (-1 for unknown
+    zips), so a lookup is an array access instead of a query.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+
+        self._pairs = []
+        self._positions = np.full(ZIP_TABLE_SIZE, -1, dtype=np.int16)
+
+        pair_positions = {}
+        skipped = 0
+        for zip, region, division in rows:
+            if zip < 0 or zip >= ZIP_TABLE_SIZE:
+                skipped += 1
+                continue
+
+            pair = (region, division)
+            if pair not in pair_positions:
+                pair_positions[pair] = len(self._pairs)
+                self._pairs.append(pair)
+            self._positions[zip] = pair_positions[pair]
+
+        if skipped:
+            logging.warning(f"Skipped {skipped} US Regions with a zip out of 0-{ZIP_TABLE_SIZE - 1}")
+        self._size = len(rows) - skipped
+
+    def __len__(self):
+        return self._size
+
+    def get(self, zip: int):
+        if zip < 0 or zip >= len(self._positions):
+            return None
+
+        position = self._positions[zip]
+        if position < 0:
+            return None
+
+        region, division = self._pairs[position]
+        return ZipRegion(zip, region, division)
+
 
 def update_regions(db_session, us_regions_csv):
+    us_regions = []
     for idx, row in us_regions_csv.iterrows():
         us_region = get_us_region_object(row)
         
-        logging.info(f"Update US Region for zip {us_region['zip']}")
-        
         if pd.isna(us_region['zip']):
             continue
         
-        UsRegion.upsert(db_session, us_region)
+        us_regions.append(clean_dict_for_sqlalchemy(us_region))
+    
+    count = UsRegion.bulk_upsert(db_session, us_regions)
+    invalidate_zip_region_table()
+    logging.info(f"Updated {count} US Regions")
 
 
 def get_us_region_by_zip(db_session, zip):
     if pd.isna(zip):
         return None
-    return UsRegion.get_by_zip(db_session, zip)
- 
-    
+
+    try:
+        zip_number = int(zip)
+    except (TypeError, ValueError):
+        return UsRegion.get_by_zip(db_session, zip)
+
+    return get_zip_region_table(db_session).get(zip_number)
+
+
+def get_zip_region_table(db_session) -> ZipRegionTable:
+    """
+    Process-wide table, loaded on first use and again after
+    invalidate_zip_region_table().
+    """
+    with _zip_region_table_lock:
+        table, version = _zip_region_table, _zip_region_table_version
+    if table is not None:
+        return table
+
+    rows = db_session.query(UsRegion.zip, UsRegion.region, UsRegion.division).all()
+    table = ZipRegionTable(rows)
+    logging.info(f"Loaded {len(table)} US Regions zips")
+
+    return _store_zip_region_table(table, version)
+
+
+def invalidate_zip_region_table():
+    global _zip_region_table, _zip_region_table_version
+    with _zip_region_table_lock:
+        _zip_region_table = None
+        _zip_region_table_version += 1
+
+
+def _store_zip_region_table(table, version):
+    global _zip_region_table
+    with _zip_region_table_lock:
+        # Not kept if the regions were updated while it was loading
+        if version == _zip_region_table_version:
+            _zip_region_table = table
+    return table
+
+
 def get_us_region_object(row):
     return {
         "zip" : row["PhysicalZip"],
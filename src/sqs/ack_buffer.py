@@ -0,0 +1,96 @@
+# src/sqs/ack_buffer.py
+import logging
+import threading
+
+from sqs.sqs_client import DELETE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AckBuffer:
+    """
+    Collects the receipt handles of processed messages and deletes them
+    with DeleteMessageBatch instead of one DeleteMessage per message.
+
+    The buffer is flushed when it holds 10 handles, when flush() is called
+    (e.g. at the end of a received batch) or max_wait_seconds after the
+    first pending ack. Entries that fail for a reason other than a bad
+    request are kept for the next flush, up to max_attempts.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        max_wait_seconds: float = 2.0,
+        max_attempts: int = 3,
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.max_wait_seconds = max_wait_seconds
+        self.max_attempts = max_attempts
+
+        self._pending: list[tuple[str, int]] = []  # (receipt_handle, attempt)
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, receipt_handle: str):
+        with self._lock:
+            self._pending.append((receipt_handle, 1))
+            is_full = len(self._pending) >= DELETE_BATCH_SIZE
+            if not is_full:
+                self._schedule_flush()
+
+        if is_full:
+            self.flush()
+
+    def flush(self) -> list[dict]:
+        """
+        Deletes every pending message. Returns the entries that failed.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not pending:
+            return []
+
+        attempts = dict(pending)
+        try:
+            failed = self.sqs.delete_messages_batch(self.queue_url, list(attempts))
+        except Exception as e:
+            logger.warning("Error deleting messages from %s: %s", self.queue_url, e)
+            failed = [
+                {"ReceiptHandle": handle, "Code": type(e).__name__, "Message": str(e), "SenderFault": False}
+                for handle in attempts
+            ]
+
+        retry = []
+        for entry in failed:
+            handle = entry["ReceiptHandle"]
+            attempt = attempts[handle]
+            if not entry["SenderFault"] and attempt < self.max_attempts:
+                retry.append((handle, attempt + 1))
+            else:
+                logger.error(
+                    "Giving up deleting message from %s: %s - %s",
+                    self.queue_url,
+                    entry["Code"],
+                    entry["Message"],
+                )
+
+        if retry:
+            with self._lock:
+                self._pending.extend(retry)
+                self._schedule_flush()
+
+        return failed
+
+    def _schedule_flush(self):
+        # must be called holding self._lock
+        if self._timer is None and self._pending:
+            self._timer = threading.Timer(self.max_wait_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
@@ -1,10 +1,16 @@
 # app/infra/base_consumer.py
 import json
 import logging
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 
+from sqlalchemy.orm import sessionmaker
+
+from sqs.ack_buffer import AckBuffer
 from sqs.sqs_client import SQSClient
+from sqs.visibility_heartbeat import VisibilityHeartbeat
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +22,65 @@ class BaseSQSConsumer(ABC):
     Each subclass must define:
       - queue_url (str)
       - handle(payload, raw_message, message_attributes )
+
+    Optionally, a subclass can set max_concurrency > 1 to handle the
+    messages of a received batch in parallel (each worker gets its own
+    DB session, available as self.db_session inside handle).
+
+    Setting visibility_heartbeat_interval enables a heartbeat that keeps
+    extending the visibility of received messages (by
+    visibility_heartbeat_extension seconds) until they are handled, up to
+    visibility_heartbeat_max_seconds in flight.
+
+    Processed messages are acknowledged in batches (DeleteMessageBatch) at
+    the end of each received batch or after ack_flush_interval_seconds.
     """
 
     queue_url: str
     max_number_of_messages: int = 10
     wait_time_seconds: int = 20
     visibility_timeout = None
+    max_concurrency: int = 1
+    visibility_heartbeat_interval = None
+    visibility_heartbeat_extension: int = 300
+    visibility_heartbeat_max_seconds: int = 12 * 60 * 60  # SQS limit
+    ack_flush_interval_seconds: float = 2.0
 
-    def __init__(self, sqs_client = None, db_session = None):
+    def __init__(self, sqs_client = None, db_session = None, session_factory = None):
         self.sqs = sqs_client or SQSClient()
-        self.db_session = db_session
+        self.session_factory = session_factory
+        self._shared_db_session = db_session
+        self._local = threading.local()
         self._stopped = False
 
+        self._in_flight = 0
+        self._in_flight_cond = threading.Condition()
+
+        self._acks = AckBuffer(
+            self.sqs, self.queue_url, max_wait_seconds=self.ack_flush_interval_seconds
+        )
+
+        self._heartbeat = None
+        if self.visibility_heartbeat_interval:
+            self._heartbeat = VisibilityHeartbeat(
+                self.sqs,
+                self.queue_url,
+                interval=self.visibility_heartbeat_interval,
+                extension=self.visibility_heartbeat_extension,
+                max_seconds=self.visibility_heartbeat_max_seconds,
+            )
+
+    @property
+    def db_session(self):
+        """
+        Session of the current worker thread, or the consumer session
+        when running outside of the worker pool.
+        """
+        worker_session = getattr(self._local, "db_session", None)
+        if worker_session is not None:
+            return worker_session
+        return self._shared_db_session
+
     @abstractmethod
     def handle(
         self,
@@ -45,6 +98,8 @@ class BaseSQSConsumer(ABC):
         Simple method to signal stop (can be used with signal handler).
         """
         self._stopped = True
+        with self._in_flight_cond:
+            self._in_flight_cond.notify_all()
 
     def _process_single_message(self, message: Dict[str, Any]):
         receipt_handle = message["ReceiptHandle"]
@@ -55,8 +110,9 @@ class BaseSQSConsumer(ABC):
             payload = json.loads(raw_body)
         except json.JSONDecodeError:
             logger.error("Invalid message (not JSON): %s", raw_body)
+            self._untrack(receipt_handle)
             # here you usually want to discard to avoid poison message
-            self.sqs.delete_message(self.queue_url, receipt_handle)
+            self._acks.add(receipt_handle)
             return
 
         logger.info(
@@ -67,29 +123,112 @@ class BaseSQSConsumer(ABC):
         )
 
         try:
-            self.handle(payload, attributes, message)
-            self.sqs.delete_message(self.queue_url, receipt_handle)
+            try:
+                self.handle(payload, attributes, message)
+            finally:
+                self._untrack(receipt_handle)
+            self._acks.add(receipt_handle)
         except Exception:
             logger.exception("Error processing message from queue %s", self.queue_url)
 
+    def _untrack(self, receipt_handle: str):
+        if self._heartbeat is not None:
+            self._heartbeat.untrack(receipt_handle)
+
+    def _new_worker_session(self):
+        if self.session_factory is None:
+            if self._shared_db_session is None:
+                return None
+            # No factory given: workers open sessions on the same engine
+            self.session_factory = sessionmaker(bind=self._shared_db_session.get_bind())
+        return self.session_factory()
+
+    def _process_in_worker(self, message: Dict[str, Any]):
+        """
+        Runs a message inside the worker pool with a session of its own.
+        """
+        session = self._new_worker_session()
+        self._local.db_session = session
+        try:
+            self._process_single_message(message)
+        finally:
+            self._local.db_session = None
+            if session is not None:
+                session.close()
+            with self._in_flight_cond:
+                self._in_flight -= 1
+                self._in_flight_cond.notify_all()
+
+    def _wait_for_free_workers(self) -> int:
+        """
+        Blocks while the pool is full and returns how many workers are free.
+        """
+        with self._in_flight_cond:
+            while self._in_flight >= self.max_concurrency and not self._stopped:
+                self._in_flight_cond.wait(timeout=1)
+            return self.max_concurrency - self._in_flight
+
+    def _receive(self, max_number: int):
+        messages = self.sqs.receive_messages(
+            queue_url=self.queue_url,
+            max_number=max_number,
+            wait_time_seconds=self.wait_time_seconds,
+            visibility_timeout=self.visibility_timeout,
+        )
+        # Messages waiting for their turn in the batch are extended as well
+        if self._heartbeat is not None:
+            for msg in messages:
+                self._heartbeat.track(msg["ReceiptHandle"])
+        return messages
+
     def start(self):
         """
         Simple consumption loop with long polling.
         """
         logger.info("Starting SQS consumer for queue: %s", self.queue_url)
-        while not self._stopped:
-            messages = self.sqs.receive_messages(
-                queue_url=self.queue_url,
-                max_number=self.max_number_of_messages,
-                wait_time_seconds=self.wait_time_seconds,
-                visibility_timeout=self.visibility_timeout,
-            )
-
-            if not messages:
-                # nada na fila
-                continue
-
-            for msg in messages:
-                self._process_single_message(msg)
-
+        if self.max_concurrency > 1:
+            self._start_concurrent()
+        else:
+            while not self._stopped:
+                messages = self._receive(self.max_number_of_messages)
+
+                if not messages:
+                    # nada na fila
+                    continue
+
+                for msg in messages:
+                    self._process_single_message(msg)
+                self._acks.flush()
+
+        self._acks.flush()
+        if self._heartbeat is not None:
+            self._heartbeat.stop()
         logger.info("SQS consumer completed for queue: %s", self.queue_url)
+
+    def _start_concurrent(self):
+        """
+        Consumption loop that dispatches messages to a bounded worker pool.
+        Only polls for as many messages as there are free workers.
+        """
+        logger.info(
+            "Using %d workers for queue: %s", self.max_concurrency, self.queue_url
+        )
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix=type(self).__name__,
+        ) as executor:
+            while not self._stopped:
+                free_workers = self._wait_for_free_workers()
+                if self._stopped:
+                    break
+
+                messages = self._receive(min(self.max_number_of_messages, free_workers))
+
+                if not messages:
+                    continue
+
+                for msg in messages:
+                    with self._in_flight_cond:
+                        self._in_flight += 1
+                    executor.submit(self._process_in_worker, msg)
+            # leaving the with block waits for the in-flight messages
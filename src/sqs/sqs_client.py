@@ -4,6 +4,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# SQS limit of entries per DeleteMessageBatch call
+DELETE_BATCH_SIZE = 10
+
 
 class SQSClient:
     def __init__(self, region_name = "us-east-1"):
@@ -37,6 +40,43 @@ class SQSClient:
             QueueUrl=queue_url, ReceiptHandle=receipt_handle
         )
 
+    def delete_messages_batch(
+        self, queue_url: str, receipt_handles: list[str]
+    ) -> list[dict]:
+        """
+        Deletes the messages with DeleteMessageBatch, 10 per call.
+        Returns the failed entries (ReceiptHandle, Code, Message, SenderFault).
+        """
+        failed = []
+        for start in range(0, len(receipt_handles), DELETE_BATCH_SIZE):
+            chunk = receipt_handles[start:start + DELETE_BATCH_SIZE]
+            resp = self._client.delete_message_batch(
+                QueueUrl=queue_url,
+                Entries=[
+                    {"Id": str(i), "ReceiptHandle": handle}
+                    for i, handle in enumerate(chunk)
+                ],
+            )
+            for entry in resp.get("Failed", []):
+                failed.append(
+                    {
+                        "ReceiptHandle": chunk[int(entry["Id"])],
+                        "Code": entry.get("Code"),
+                        "Message": entry.get("Message"),
+                        "SenderFault": entry.get("SenderFault", False),
+                    }
+                )
+        return failed
+
+    def change_visibility(
+        self, queue_url: str, receipt_handle: str, visibility_timeout: int
+    ):
+        self._client.change_message_visibility(
+            QueueUrl=queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=visibility_timeout,
+        )
+
     def send_message(self, queue_url: str, body: str, message_attributes = None):
         params = {
             "QueueUrl": queue_url,
@@ -0,0 +1,83 @@
+# src/sqs/visibility_heartbeat.py
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VisibilityHeartbeat:
+    """
+    Keeps in-flight SQS messages invisible while their handler is still running.
+
+    Every `interval` seconds, each tracked receipt handle gets its visibility
+    timeout set to `extension` seconds (ChangeMessageVisibility counts from now).
+    A message stops being extended once it has been in flight for
+    `max_seconds`, so a stuck handler cannot hold a message forever.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        queue_url: str,
+        interval: int,
+        extension: int,
+        max_seconds: int,
+    ):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+        self.interval = interval
+        self.extension = extension
+        self.max_seconds = max_seconds
+
+        self._handles: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def track(self, receipt_handle: str):
+        with self._lock:
+            self._handles[receipt_handle] = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="VisibilityHeartbeat", daemon=True
+                )
+                self._thread.start()
+
+    def untrack(self, receipt_handle: str):
+        with self._lock:
+            self._handles.pop(receipt_handle, None)
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self._beat()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            in_flight = list(self._handles.items())
+
+        for receipt_handle, tracked_since in in_flight:
+            remaining = self.max_seconds - (now - tracked_since)
+            if remaining < 1:
+                logger.warning(
+                    "Message on %s reached the visibility ceiling of %ss; no longer extended",
+                    self.queue_url,
+                    self.max_seconds,
+                )
+                self.untrack(receipt_handle)
+                continue
+
+            try:
+                self.sqs.change_visibility(
+                    self.queue_url, receipt_handle, int(min(self.extension, remaining))
+                )
+            except Exception as e:
+                # Usually the handle is no longer valid (message deleted or expired)
+                logger.warning(
+                    "Could not extend visibility on %s: %s", self.queue_url, e
+                )
+                self.untrack(receipt_handle)
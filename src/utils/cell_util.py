@@ -18,6 +18,10 @@ ABBR_MAP = {
     " HIGHWAY ": " HWY ",
 }
 
+SLUG_SEPARATOR_RE = re.compile(r"[^a-z0-9]+")
+SLUG_DASHES_RE = re.compile(r"-+")
+WHITESPACE_RE = re.compile(r"\s+")
+
 
 def slugify_string(string: str) -> str:
     s = (string or "").strip().lower()
@@ -39,6 +43,46 @@ def title_case_city(string: str) -> str:
     return (string or "").title().strip()
 
 
+def str_values(values: pd.Series) -> pd.Series:
+    """
+    values as object dtype (the .str methods then run the Python str
+    methods, as the scalar functions do), with NaN for non-str values.
+    """
+    values = values.astype(object)
+    return values.where(values.map(lambda value: isinstance(value, str)))
+
+
+def slugify_series(values: pd.Series) -> pd.Series:
+    """
+    slugify_string of each str value (NaN for the others).
+    """
+    s = str_values(values).str.strip().str.lower()
+    s = s.str.replace(SLUG_SEPARATOR_RE, "-", regex=True)
+    return s.str.replace(SLUG_DASHES_RE, "-", regex=True).str.strip("-")
+
+
+def normalize_address_series(values: pd.Series) -> pd.Series:
+    """
+    normalize_address of each str or null value (NaN for the others).
+    """
+    s = " " + str_values(values).str.upper() + " "
+    for k, v in ABBR_MAP.items():
+        s = s.str.replace(k, v, regex=False)
+    s = s.str.replace(WHITESPACE_RE, " ", regex=True).str.strip()
+    return s.mask(values.isna() | (values.astype(object) == ""), "")
+
+
+def title_case_city_series(values: pd.Series) -> pd.Series:
+    """
+    title_case_city of each str value (NaN for the others).
+    """
+    return str_values(values).str.title().str.strip()
+
+
+def upper_strip_series(values: pd.Series) -> pd.Series:
+    return str_values(values).str.upper().str.strip()
+
+
 def parse_dateflex(x: Any) -> Optional[date]:
     if pd.isna(x):
         return None
@@ -58,6 +102,24 @@ def parse_dateflex(x: Any) -> Optional[date]:
         return None
     
 
+def parse_dateflex_series(values: pd.Series, format: Optional[str] = None) -> pd.Series:
+    """
+    parse_dateflex of each value. The str values in format are parsed at
+    once, only the others value by value.
+    """
+    values = values.astype(object)
+    dates = pd.Series([None] * len(values), index=values.index, dtype=object)
+
+    is_parsed = pd.Series(False, index=values.index)
+    if format:
+        parsed = pd.to_datetime(str_values(values), format=format, errors="coerce")
+        is_parsed = parsed.notna()
+        dates[is_parsed] = parsed[is_parsed].dt.date
+
+    dates[~is_parsed] = values[~is_parsed].map(parse_dateflex)
+    return dates
+
+
 def midpoint(a: Optional[date], b: Optional[date]) -> Optional[date]:
     if not a or not b:
         return b or a
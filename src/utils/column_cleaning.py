@@ -0,0 +1,168 @@
+#
+# Column-wise cleaning of the auxiliary spreadsheets (Parent Chains,
+# Landlords, Centers) before they are bulk loaded.
+#
+# Each loader describes its table with a list of ColumnSpec (spreadsheet
+# column -> table column + converter), and the whole DataFrame is converted
+# column by column instead of cell by cell.
+#
+import logging
+import re
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ColumnSpec = namedtuple("ColumnSpec", ["source", "target", "converter"], defaults=["scalar"])
+
+TRUE_STRINGS = ("true", "verdadeiro", "1", "yes", "sim")
+INT_ID_RE = re.compile(r"^\s*[+-]?\d+\s*$")
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (bool, int, float, np.bool_, np.integer, np.floating)) and not pd.isna(value)
+
+
+def is_str(value) -> bool:
+    return isinstance(value, str)
+
+
+def clean_scalar_series(values: pd.Series) -> pd.Series:
+    """
+    NaN / NaT -> None, the original value otherwise.
+    """
+    values = values.astype(object)
+    return values.where(values.notna(), None)
+
+
+def clean_text_series(values: pd.Series) -> pd.Series:
+    """
+    str of each value, None for NaN.
+    """
+    values = values.astype(object)
+    return values.map(str).where(values.notna(), None)
+
+
+def clean_text_id_series(values: pd.Series) -> pd.Series:
+    """
+    Stripped str of each value, None for NaN and empty strings.
+    """
+    values = values.astype(object)
+    text = values.map(str).str.strip()
+    return text.where(values.notna() & (text != ""), None)
+
+
+def clean_bool_series(values: pd.Series) -> pd.Series:
+    """
+    Curation flags (ArchiveRecord, ManualChange, IsPublic...) to bool:
+    strings like 'TRUE', 'sim', '1' are True, numbers are True when not 0,
+    NaN and anything else is False.
+    """
+    values = values.astype(object)
+    strings = values.where(values.map(is_str))
+    result = strings.str.strip().str.lower().isin(TRUE_STRINGS).to_numpy(copy=True)
+
+    numbers = values.map(is_number).to_numpy()
+    if numbers.any():
+        result[numbers] = values[numbers].astype(float).to_numpy() != 0
+    return pd.Series(result, index=values.index, dtype=object)
+
+
+def clean_int_id_series(values: pd.Series) -> pd.Series:
+    """
+    IDs to int or None: numbers are truncated (123.0 -> 123), strings must
+    be an integer (" 42 " -> 42, "QR1001" -> None).
+    """
+    values = values.astype(object)
+    result = none_series(values.index)
+
+    numbers = values.map(lambda value: is_number(value) and np.isfinite(float(value)))
+    result[numbers] = values[numbers].map(int).astype(object)
+
+    strings = values.map(is_str)
+    text = values[strings].str.strip()
+    is_int = text.str.match(INT_ID_RE)
+    result[is_int[is_int].index] = text[is_int].map(int).astype(object)
+
+    invalid = text[~is_int & (text != "")]
+    log_invalid(values.name, invalid)
+    return result
+
+
+def clean_percentage_series(values: pd.Series) -> pd.Series:
+    """
+    Percentages to float or None. Accepts 50, "50", "50%" and "50,5%"
+    (BR/EU decimal comma).
+    """
+    values = values.astype(object)
+    result = none_series(values.index)
+
+    numbers = values.map(is_number)
+    result[numbers] = values[numbers].map(float).astype(object)
+
+    strings = values.map(is_str)
+    text = values[strings].str.strip().str.replace(r"%$", "", regex=True).str.strip().str.replace(",", ".", regex=False)
+    text = text[values[strings].str.strip() != ""]
+    parsed = text.map(parse_float).astype(object)
+    result[parsed.index] = parsed.where(parsed.notna(), None)
+
+    log_invalid(values.name, values[parsed[parsed.isna()].index])
+    return result
+
+
+def none_series(index) -> pd.Series:
+    return pd.Series([None] * len(index), index=index, dtype=object)
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def log_invalid(column, invalid: pd.Series):
+    if len(invalid) > 0:
+        logger.warning("Could not convert %d value(s) of %s, e.g. %r", len(invalid), column, invalid.iloc[:5].tolist())
+
+
+CONVERTERS = {
+    "scalar": clean_scalar_series,
+    "text": clean_text_series,
+    "text_id": clean_text_id_series,
+    "bool": clean_bool_series,
+    "int_id": clean_int_id_series,
+    "percentage": clean_percentage_series,
+}
+
+
+def clean_frame(df: pd.DataFrame, spec: List[ColumnSpec]) -> pd.DataFrame:
+    """
+    One column per ColumnSpec target, converted from its source column. A
+    source column missing from df gives False for bool and None otherwise.
+    """
+    columns = {}
+    for column in spec:
+        if column.source in df.columns:
+            columns[column.target] = CONVERTERS[column.converter](df[column.source])
+        else:
+            columns[column.target] = pd.Series([False] * len(df), index=df.index, dtype=object) if column.converter == "bool" else none_series(df.index)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def clean_records(df: pd.DataFrame, spec: List[ColumnSpec]) -> List[dict]:
+    """
+    clean_frame as a list of dicts, ready for Model.bulk_upsert.
+    """
+    return clean_frame(df, spec).to_dict("records")
+
+
+def clean_arrow_table(df: pd.DataFrame, spec: List[ColumnSpec]):
+    """
+    clean_frame as a pyarrow Table (pyarrow must be installed).
+    """
+    import pyarrow as pa
+    return pa.Table.from_pandas(clean_frame(df, spec), preserve_index=False)
@@ -0,0 +1,91 @@
+#
+# Read schemas of the partner CSV files.
+#
+# The Changes-Over-Time export has around 60 columns (AdminLevel1..6,
+# OtherFields, AdditionalAttributes, ...) but the reports use about 20, so
+# only those are parsed, with fixed types: the unused columns are never
+# loaded, and a file is typed the same way whole or in chunks.
+#
+import logging
+from collections import namedtuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ReadSchema = namedtuple("ReadSchema", ["columns", "dtypes", "date_format"])
+
+# Text columns keep their text (e.g. a StoreNumber "012"), categories are
+# used for the low cardinality ones
+COLLECTION_SCHEMA = ReadSchema(
+    columns=[
+        "Status", "ChainId", "ChainName", "ParentChainId", "ParentChainName",
+        "StoreName", "StoreNumber", "Address", "Address2", "City", "PostalCode",
+        "State", "PhoneNumber", "ComingSoon", "StoreHours", "Latitude",
+        "Longitude", "HashId", "SiteId", "LastUpdate",
+    ],
+    dtypes={
+        "Status": "category",
+        "ChainName": "category",
+        "State": "category",
+        "ParentChainName": "category",
+        "HashId": "string",
+        "PostalCode": "string",
+        "StoreName": str,
+        "StoreNumber": str,
+        "Address": str,
+        "Address2": str,
+        "City": str,
+        "PhoneNumber": str,
+        "StoreHours": str,
+        "SiteId": str,
+        "LastUpdate": str,
+    },
+    date_format="%m/%d/%Y",
+)
+
+# The collection file of a chainscrapes file is only used for the
+# Added / Removed counts
+COLLECTION_STATUS_SCHEMA = ReadSchema(
+    columns=["Status", "ChainId", "LastUpdate"],
+    dtypes={"Status": "category", "LastUpdate": str},
+    date_format=COLLECTION_SCHEMA.date_format,
+)
+
+# Every column of the chain scrapes file is in the enriched CSV
+CHAIN_SCRAPE_SCHEMA = ReadSchema(
+    columns=["ChainId", "ChainName", "Date", "Time", "LocationCount", "UsLocationCount"],
+    dtypes={"ChainName": "category", "Date": str, "Time": str},
+    date_format="%Y-%m-%d",
+)
+
+
+def get_read_csv_kwargs(file, schema: ReadSchema):
+    """
+    usecols and dtype of the schema for the columns the file has (a
+    missing column is left to fail where it is used, as before).
+    """
+    header = pd.read_csv(file, nrows=0).columns
+    columns = [column for column in schema.columns if column in header]
+    dtypes = {column: dtype for column, dtype in schema.dtypes.items() if column in columns}
+    return {"usecols": columns, "dtype": dtypes}
+
+
+def read_csv_with_schema(file, schema: ReadSchema, engine=None):
+    """
+    engine="pyarrow" parses with multiple threads when pyarrow is
+    installed, and falls back to the default parser when it is not.
+    """
+    if engine == "pyarrow" and not has_pyarrow():
+        logger.warning("pyarrow is not installed, reading CSV with the default engine")
+        engine = None
+
+    return pd.read_csv(file, engine=engine, **get_read_csv_kwargs(file, schema))
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
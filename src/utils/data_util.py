@@ -48,6 +48,9 @@ def parse_time_string(time_string: str) -> Optional[time]:
     raise ValueError(f"Error formatting string '{time_string}' for Time class: No Match found for HH:MM:SS.")
 
 
+ZIP_RE = re.compile(r"(\d{5})")
+
+
 def get_zip_treated(zip_str):
     if pd.isna(zip_str):
         return None
@@ -56,6 +59,16 @@ def get_zip_treated(zip_str):
     return match.group(1) if match else None
 
 
+def get_zip_treated_series(values: pd.Series) -> pd.Series:
+    """
+    get_zip_treated of each str or null value (NaN for the others too).
+    """
+    values = values.astype(object)
+    is_str = values.map(lambda value: isinstance(value, str))
+    zips = values.where(is_str).str.extract(ZIP_RE, expand=False)
+    return zips.astype(object).where(zips.notna(), None)
+
+
 def truncate(number, decimals):
     factor = 10 ** decimals
     return int(number * factor) / factor
@@ -64,9 +77,40 @@ def truncate(number, decimals):
 def clean_dict_for_sqlalchemy(data: Dict[str, Any]) -> Dict[str, Any]:
     cleaned_data = {}
     for key, value in data.items():
-        if isinstance(value, float) and np.isnan(value):
+        if value is pd.NA or (isinstance(value, float) and np.isnan(value)):
             cleaned_data[key] = None
         else:
             cleaned_data[key] = value
             
-    return cleaned_data
\ No newline at end of file
+    return cleaned_data
+
+
+def read_csv_in_chain_chunks(file, chunk_size, chain_column="ChainId", **read_csv_kwargs):
+    """
+    Reads the CSV chunk_size rows at a time and yields DataFrames that end
+    on a chain_column boundary: the rows of the last chain of each chunk
+    are held back and yielded with the next one, so every DataFrame has
+    all the rows of its chains (a chain longer than chunk_size is yielded
+    whole). The rows of each chain must be contiguous in the file.
+
+    Column types are inferred per chunk, so pass dtype in read_csv_kwargs
+    (see csv_schema.get_read_csv_kwargs) for columns that must not change
+    type between chunks.
+    """
+    pending = None
+    for chunk in pd.read_csv(file, chunksize=chunk_size, **read_csv_kwargs):
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        
+        chain_ids = chunk[chain_column].to_numpy()
+        other_chains = np.flatnonzero(chain_ids != chain_ids[-1])
+        if len(other_chains) == 0:
+            pending = chunk
+            continue
+        
+        split = other_chains[-1] + 1
+        yield chunk.iloc[:split]
+        pending = chunk.iloc[split:]
+    
+    if pending is not None and len(pending) > 0:
+        yield pending
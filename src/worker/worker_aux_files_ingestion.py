@@ -35,6 +35,8 @@ s3_processed_bucket = os.getenv("S3_PROCESSED_BUCKET_NAME")
 class AuxFilesIngestionConsumer(BaseSQSConsumer):
     queue_name = os.getenv("SQS_QUEUE_AUX_FILES")
     queue_url = f"https://sqs.us-east-1.amazonaws.com/461391639742/{queue_name}"
+    # If True, every message processes all files under curated/ instead of the event key
+    full_prefix_sweep = False
 
     def handle(self, payload, raw_message, message_attributes ):        # Ignore S3 TestEvent messages (sent when configuring notifications)
         if isinstance(payload, dict) and payload.get("Event") == "s3:TestEvent":
@@ -48,7 +50,7 @@ class AuxFilesIngestionConsumer(BaseSQSConsumer):
             folder = "./download/aux-files/"
             s3_service = S3CsvService(bucket_name=s3_raw_bucket)
             
-            files_key = s3_service.list_csv_files("curated")
+            files_key = s3_service.resolve_event_file_keys(payload, "curated", self.full_prefix_sweep, suffix=None)
             if not files_key:
                 return
             
@@ -59,16 +61,16 @@ class AuxFilesIngestionConsumer(BaseSQSConsumer):
                 if not file:
                     continue        
                 
-                if file_key.startswith("Table - US Regions"):
+                if base_name.startswith("Table - US Regions"):
                     df_xlsl = pd.read_excel(file)
                     update_regions(self.db_session, df_xlsl)
-                elif file_key.startswith("Table - Parent Chains"):
+                elif base_name.startswith("Table - Parent Chains"):
                     df_xlsl = pd.read_excel(file)
                     upsert_parent_chains_from_excel(self.db_session, df_xlsl)
-                elif file_key.startswith("Table - Centers"):
+                elif base_name.startswith("Table - Centers"):
                     df_xlsl = pd.read_excel(file)
                     update_centers_from_excel(self.db_session, df_xlsl)
-                elif file_key.startswith("Table - Landlords"):
+                elif base_name.startswith("Table - Landlords"):
                     df_xlsl = pd.read_excel(file)
                     upsert_landlords_from_excel(self.db_session, df_xlsl)
                 else:
@@ -80,7 +82,7 @@ class AuxFilesIngestionConsumer(BaseSQSConsumer):
                     file_list=[base_name],
                     dry_run=False
                 )
-                s3_service.clean_local_files(folder, [file_key])
+                s3_service.clean_local_files(folder, [base_name])
                 
                 create_file_event_log_for_uploaded(self.db_session, current_file_key, None, now)
         
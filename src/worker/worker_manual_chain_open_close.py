@@ -2,6 +2,7 @@ from importlib.resources import files
 import logging
 import os
 import boto3
+import pandas as pd
 
 from sqs.base_sqs_consumer import BaseSQSConsumer
 from service.s3 import S3CsvService
@@ -28,6 +29,8 @@ s3_processed_bucket = os.getenv("S3_PROCESSED_BUCKET_NAME")
 class ManualOpenCloseChainConsumer(BaseSQSConsumer):
     queue_name = os.getenv("SQS_QUEUE_MANUAL_OPEN_CLOSE_CHAIN")
     queue_url = f"https://sqs.us-east-1.amazonaws.com/461391639742/{queue_name}"
+    # If True, every message processes all files under open-close-chain/ instead of the event key
+    full_prefix_sweep = False
 
     def handle(self, payload, raw_message, message_attributes ):
         current_file_key = ""
@@ -37,28 +40,29 @@ class ManualOpenCloseChainConsumer(BaseSQSConsumer):
             folder = "./download/manual-open-close-chain/"
             s3_service = S3CsvService(bucket_name=s3_raw_bucket)
             
-            files_key = s3_service.list_csv_files("open-close-chain")
+            files_key = s3_service.resolve_event_file_keys(payload, "open-close-chain", self.full_prefix_sweep)
             if not files_key:
                 return
             
             for file_key in files_key:
                 current_file_key = file_key
-                file = s3_service.download_csv_file(current_file_key, "open-close-chain", folder, bucket_name=s3_raw_bucket)
+                base_name = current_file_key.split("/")[-1]
+                file = s3_service.download_csv_file(base_name, "open-close-chain", folder, bucket_name=s3_raw_bucket)
                 if not file:
                     continue        
 
-                update_location_status(self.db_session, file)
+                update_location_status(self.db_session, pd.read_csv(file))
                 
                 s3_service.clean_local_files(
                     local_folder=folder,
-                    file_list=[file_key],
+                    file_list=[base_name],
                     dry_run=False
                 )
                 
                 s3_service.move_files(
                     source_folder="open-close-chain/",
                     destination_folder="open-close-chain-processed/",
-                    file_list=[current_file_key],
+                    file_list=[base_name],
                     dry_run=False
                 )
                 
@@ -2,7 +2,6 @@ from importlib.resources import files
 import logging
 import os
 import boto3
-import pandas as pd
 
 from sqs.base_sqs_consumer import BaseSQSConsumer
 from service.s3 import S3CsvService
@@ -10,8 +9,10 @@ from service.file_event_service import create_file_event_log_for_uploaded, creat
 
 from datetime import datetime, timedelta
 
-from service.quality_report_service import generate_quality_report_and_save
-from service.report_service import generate_report_for_chain_scraper, generate_report_for_collection
+from service.quality_report_service import QualityReportCollector
+from service.report_service import generate_report_for_chain_scraper, generate_collection_report_with_quality, generate_report_for_collection_in_chunks
+from utils.data_util import read_csv_in_chain_chunks
+from utils.csv_schema import COLLECTION_SCHEMA, COLLECTION_STATUS_SCHEMA, CHAIN_SCRAPE_SCHEMA, get_read_csv_kwargs, read_csv_with_schema
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +31,32 @@ s3_processed_bucket = os.getenv("S3_PROCESSED_BUCKET_NAME")
 class ReportGenerationConsumer(BaseSQSConsumer):
     queue_name = os.getenv("SQS_QUEUE_FILE_INGESTION")
     queue_url = f"https://sqs.us-east-1.amazonaws.com/461391639742/{queue_name}"
+    # Large collection files can outlast the queue visibility timeout, so the
+    # heartbeat extends it; the first beat must come before it expires
+    visibility_timeout = 300
+    visibility_heartbeat_interval = 60
+    # If True, every message processes all files under raw/ instead of the event key
+    full_prefix_sweep = False
+    # If set, collection files are read and processed this many rows at a time
+    # (aligned to ChainId), instead of loading the whole file
+    stream_chunk_size = None
+    # "pyarrow" to parse whole files with pyarrow when installed (not used for chunks)
+    csv_engine = None
+    # If set, the chains of collection files are processed by this many processes
+    parallel_workers = None
+    # If False, only the per-column completeness summary of the quality report is saved
+    quality_report_detail = True
+    # If True, the writes of each chain share one commit (or every commit_every rows)
+    transactional = False
+    commit_every = None
+    # If True, new locations and events are written with COPY + merge instead of one upsert per row
+    bulk_load = False
+    # If True, the locations of each chain are loaded once and matched in memory.
+    # Turns transactional on too, since every commit expires the cached locations
+    cache_locations = False
+    # If True, the previous events of each (ChainId, LastUpdate) group are fetched in one query.
+    # Turns transactional on too, since every commit expires the prefetched events
+    batch_last_events = False
 
     def handle(self, payload, raw_message, message_attributes ):
         if isinstance(payload, dict) and payload.get("Event") == "s3:TestEvent":
@@ -43,7 +70,7 @@ class ReportGenerationConsumer(BaseSQSConsumer):
             folder = "./download/raw-for-process/"
             s3_service = S3CsvService(bucket_name=s3_raw_bucket)
             
-            files_key = s3_service.list_csv_files("raw")
+            files_key = s3_service.resolve_event_file_keys(payload, "raw", self.full_prefix_sweep)
             if not files_key:
                 return
             
@@ -54,23 +81,35 @@ class ReportGenerationConsumer(BaseSQSConsumer):
                 if not file:
                     continue        
 
-                file_type, collection_id, start_scraper_date, end_scraper_date = self.__get_file_key_info(file_key)
+                file_type, collection_id, start_scraper_date, end_scraper_date = self.__get_file_key_info(base_name)
                 
-                enriched_file_key = file_key.replace(".csv", "_enriched.csv")
-                quality_file_key = file_key.replace(".csv", "_quality_report.csv")
+                enriched_file_key = base_name.replace(".csv", "_enriched.csv")
+                quality_file_key = base_name.replace(".csv", "_quality_report.csv")
                 
                 if file_type == "chainscrapes":
                     collection_file = s3_service.download_csv_file(current_file_key.replace("chainscrapes", "collection"), "raw", folder, bucket_name=s3_raw_bucket)
                     if not collection_file:
                         raise ValueError(f"Collection file not found for chainscrapes file: {file_key}")
                     
-                    df_chain_scraper_csv = pd.read_csv(file)
-                    df_collection_csv = pd.read_csv(collection_file)
+                    df_chain_scraper_csv = read_csv_with_schema(file, CHAIN_SCRAPE_SCHEMA, self.csv_engine)
+                    df_collection_csv = read_csv_with_schema(collection_file, COLLECTION_STATUS_SCHEMA, self.csv_engine)
                     generate_report_for_chain_scraper(self.db_session, collection_id, f"{folder}{enriched_file_key}", df_chain_scraper_csv, df_collection_csv)
+                elif file_type == "collection" and self.stream_chunk_size:
+                    quality_report = QualityReportCollector(self.quality_report_detail, file)
+                    df_collection_chunks = quality_report.collect(
+                        read_csv_in_chain_chunks(file, self.stream_chunk_size, **get_read_csv_kwargs(file, COLLECTION_SCHEMA)),
+                        self.db_session, collection_id, f"{folder}{quality_file_key}",
+                    )
+                    generate_report_for_collection_in_chunks(self.db_session, collection_id, f"{folder}{enriched_file_key}", start_scraper_date, end_scraper_date, df_collection_chunks, **self.__get_report_options())
+                    quality_report.save(self.db_session, collection_id, f"{folder}{quality_file_key}")
+                    s3_service.upload_csv(folder, quality_file_key, s3_processed_bucket, "healthcheck")
                 elif file_type == "collection":
-                    df_collection_csv = pd.read_csv(file)
-                    generate_report_for_collection(self.db_session, collection_id, f"{folder}{enriched_file_key}", start_scraper_date, end_scraper_date, df_collection_csv)
-                    generate_quality_report_and_save(df_collection_csv, collection_id, f"{folder}{quality_file_key}")
+                    df_collection_csv = read_csv_with_schema(file, COLLECTION_SCHEMA, self.csv_engine)
+                    generate_collection_report_with_quality(
+                        self.db_session, collection_id, f"{folder}{enriched_file_key}", f"{folder}{quality_file_key}",
+                        start_scraper_date, end_scraper_date, df_collection_csv, self.quality_report_detail, self.parallel_workers,
+                        source_file=file, **self.__get_report_options()
+                    )
                     s3_service.upload_csv(folder, quality_file_key, s3_processed_bucket, "healthcheck")
                 else:
                     raise ValueError(f"Unknown file type: {file_type} in file key: {file_key}")
@@ -82,7 +121,7 @@ class ReportGenerationConsumer(BaseSQSConsumer):
                     dry_run=False
                 )
                 s3_service.upload_csv(folder, enriched_file_key, s3_processed_bucket, "exports")
-                s3_service.clean_local_files(folder, [file_key, enriched_file_key, quality_file_key])
+                s3_service.clean_local_files(folder, [base_name, enriched_file_key, quality_file_key])
                 
                 create_file_event_log_for_uploaded(self.db_session, current_file_key, collection_id, now)
         
@@ -92,6 +131,16 @@ class ReportGenerationConsumer(BaseSQSConsumer):
             except Exception:
                 pass
             create_file_event_log_for_error(self.db_session, current_file_key, collection_id, now, "REPORT", str(error))
+
+    def __get_report_options(self):
+        return {
+            "transactional": self.transactional or self.cache_locations or self.batch_last_events,
+            "commit_every": self.commit_every,
+            "bulk_load": self.bulk_load,
+            "cache_locations": self.cache_locations,
+            "batch_last_events": self.batch_last_events,
+        }
+
     def __get_file_key_info(self, file_key):
         file_key_parts = file_key.replace(".csv", "").split("_")
         